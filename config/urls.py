@@ -1,12 +1,14 @@
 from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from performance.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('questions/', include('questions.urls')),
     path('users/', include('users.urls')),
     path('tests/', include('tests.urls')),
+    path('metrics', metrics, name='metrics'),
     
     # YOUR PATTERNS
     path('schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from performance.seeding import seed_cohort, seed_question_bank
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic question bank and applicant cohort (sessions, answers, results) at scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--questions-per-pool',
+            type=int,
+            default=0,
+            help='Questions to create per (level, type) pair; 0 keeps the existing bank'
+        )
+        parser.add_argument('--applicants', type=int, default=1000, help='Applicants to create')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument(
+            '--active-share',
+            type=float,
+            default=0.02,
+            help='Share of applicants left with an unfinished session'
+        )
+        parser.add_argument(
+            '--idle-share',
+            type=float,
+            default=0.05,
+            help='Share of applicants that registered but never started a test'
+        )
+        parser.add_argument('--days', type=int, default=90, help='Registrations are spread over this many days')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per executemany call')
+
+    def handle(self, *args, **options):
+        if options['active_share'] + options['idle_share'] > 1:
+            raise CommandError('--active-share and --idle-share must add up to at most 1')
+
+        started = time.perf_counter()
+        if options['questions_per_pool']:
+            created = seed_question_bank(options['questions_per_pool'], seed=options['seed'],
+                                         batch_size=options['batch_size'])
+            self.stdout.write(
+                f'Created {created} questions ({created * 4} options) in {time.perf_counter() - started:.2f}s'
+            )
+
+        def progress(stats):
+            self.stdout.write(
+                f'  {stats["applicants"]} applicants, {stats["answers"]} answers '
+                f'({time.perf_counter() - cohort_started:.1f}s)'
+            )
+
+        cohort_started = time.perf_counter()
+        try:
+            seed_cohort(
+                options['applicants'],
+                seed=options['seed'],
+                active_share=options['active_share'],
+                idle_share=options['idle_share'],
+                days=options['days'],
+                batch_size=options['batch_size'],
+                progress=progress,
+            )
+        except ValueError as e:
+            raise CommandError(f'{e} (use --questions-per-pool)')
+        elapsed = time.perf_counter() - cohort_started
+
+        self.stdout.write(self.style.SUCCESS(f'Cohort generated in {elapsed:.2f}s'))
+        self.stdout.write(f'  total time: {time.perf_counter() - started:.2f}s')
@@ -0,0 +1,104 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+
+from questions.models import Question
+from tests.models import TestResult, TestSession, UserAnswer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Show the query plan and latency of the hot-path queries with and without their indexes. '
+        'Each index is dropped inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Timed executions per query')
+        parser.add_argument('--batch', type=int, default=50, help='IINs in the results-batch query')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The benchmark uses EXPLAIN QUERY PLAN and transactional DDL of SQLite')
+
+        active = TestSession.objects.filter(finished_at__isnull=True).values_list('applicant_id', 'level').first()
+        answered = UserAnswer.objects.order_by('id').values_list('applicant_id', flat=True).first()
+        batch = list(TestResult.objects.order_by('id').values_list('applicant_id', flat=True)[:options['batch']])
+        bank = Question.objects.values_list('level', 'type').first()
+        if not (active and answered and batch and bank):
+            raise CommandError('Not enough data; run generate_data first')
+
+        self.stdout.write(
+            f'{Question.objects.count()} questions, {TestSession.objects.count()} sessions, '
+            f'{UserAnswer.objects.count()} answers, {TestResult.objects.count()} results'
+        )
+
+        applicants = TestResult.objects.filter(applicant_id__in=batch).values('applicant_id').distinct()
+        latest = TestResult.objects.filter(applicant=OuterRef('applicant_id')).order_by('-created_at')
+        cases = [
+            ('question_level_type_idx', 'Question ids of a (level, type) pool',
+             Question.objects.filter(level=bank[0], type=bank[1], is_active=True).order_by('id').values_list('id')),
+            ('unique_active_session', 'Active session of an applicant and level',
+             TestSession.objects.filter(applicant_id=active[0], level=active[1], finished_at__isnull=True)),
+            ('unique_active_session', 'Active session of an applicant (session-status)',
+             TestSession.objects.filter(applicant_id=active[0], finished_at__isnull=True)),
+            ('unique_active_session', 'Every active session (applicant, level)',
+             TestSession.objects.filter(finished_at__isnull=True).values_list('applicant_id', 'level')),
+            ('answer_applicant_time_idx', 'Answer history of an applicant, newest first',
+             UserAnswer.objects.filter(applicant_id=answered).order_by('-answered_at')),
+            ('result_applicant_time_idx', f'Latest result of {len(batch)} applicants',
+             TestResult.objects.filter(id__in=Subquery(
+                 applicants.annotate(latest_id=Subquery(latest.values('id')[:1])).values('latest_id')
+             ))),
+        ]
+
+        for index_name, title, queryset in cases:
+            sql, params = queryset.query.sql_with_params()
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{title} ({index_name})'))
+
+            with_plan, with_ms = self.measure(sql, params, options['repeat'], 'with index')
+            try:
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'DROP INDEX {connection.ops.quote_name(index_name)}')
+                    without_plan, without_ms = self.measure(sql, params, options['repeat'], 'without index')
+                    raise Rollback
+            except Rollback:
+                pass
+
+            self.stdout.write('  without index:')
+            for line in without_plan:
+                self.stdout.write(f'    {line}')
+            self.stdout.write('  with index:')
+            for line in with_plan:
+                self.stdout.write(f'    {line}')
+            speedup = without_ms / with_ms if with_ms else float('inf')
+            self.stdout.write(self.style.SUCCESS(
+                f'  median {without_ms:.3f}ms -> {with_ms:.3f}ms ({speedup:.1f}x)'
+            ))
+
+    def measure(self, sql, params, repeat, label):
+        """Query plan and median latency (fetching every row) of one statement"""
+        # A distinct SQL text keeps the sqlite3 statement cache from reusing the plan
+        # prepared before the index was dropped
+        sql = f'{sql} /* {label} */'
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+            cursor.execute(sql, params)
+            cursor.fetchall()  # warm the page cache
+
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+        return plan, statistics.median(timings)
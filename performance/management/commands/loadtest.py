@@ -0,0 +1,187 @@
+import json
+import random
+import subprocess
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from performance.targets import HttpTarget, InProcessTarget, percentile
+
+STAGES = ['Grammar', 'Vocabulary', 'Reading']
+
+
+class Command(BaseCommand):
+    help = 'Simulate N applicants taking the exam concurrently and report latency per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--applicants', type=int, default=100, help='Number of simulated applicants')
+        parser.add_argument('--concurrency', type=int, default=20, help='Applicants running at the same time')
+        parser.add_argument(
+            '--base-url',
+            type=str,
+            help='Run against a server (e.g. http://127.0.0.1:8000) instead of the in-process WSGI app'
+        )
+        parser.add_argument('--iin-prefix', type=str, default='99', help='IIN prefix of the generated applicants')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the chosen answers')
+        parser.add_argument('--output', type=str, help='Write the results as JSON to this file')
+        parser.add_argument(
+            '--keep-data',
+            action='store_true',
+            help='Keep the generated applicants (in-process runs delete them by default)'
+        )
+
+    def handle(self, *args, **options):
+        if len(options['iin_prefix']) >= 12 or not options['iin_prefix'].isdigit():
+            raise CommandError('--iin-prefix must be fewer than 12 digits')
+
+        target = HttpTarget(options['base_url']) if options['base_url'] else InProcessTarget()
+        iins = [
+            options['iin_prefix'] + str(i).zfill(12 - len(options['iin_prefix']))
+            for i in range(options['applicants'])
+        ]
+        samples = []
+        samples_lock = threading.Lock()
+
+        def record(endpoint, result):
+            status, _, elapsed, queries, locked = result
+            with samples_lock:
+                samples.append((endpoint, status, elapsed, queries, locked))
+            return result
+
+        def run_flow(iin):
+            rnd = random.Random(f'{options["seed"]}-{iin}')
+            try:
+                self.run_flow(target, iin, rnd, record)
+            finally:
+                target.finish_thread()
+
+        self.stdout.write(
+            f'Running {len(iins)} applicants with concurrency {options["concurrency"]} against {target.name}...'
+        )
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            list(executor.map(run_flow, iins))
+        wall_time = time.perf_counter() - started
+
+        results = self.summarize(samples, wall_time, target, options)
+        self.write_results(results)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+        if isinstance(target, InProcessTarget) and not options['keep_data']:
+            from users.models import Applicant
+            Applicant.objects.filter(iin__in=iins).delete()
+
+    def run_flow(self, target, iin, rnd, record):
+        """register -> (questions-by-stage + finish-stage) x 3 -> submit.
+
+        The API only accepts a submission while the session is active, and
+        finishing the last stage closes it, so the answers are submitted right
+        before the last finish-stage call.
+        """
+        status, *_ = record('register', target.request(
+            'POST', '/users/register/', body={'iin': iin, 'first_name': 'Load', 'last_name': 'Test'}
+        ))
+        if status not in (200, 201):
+            return
+
+        answers = []
+        level = None
+        for stage_type in STAGES:
+            status, data, *_ = record('questions-by-stage', target.request(
+                'GET', '/tests/questions-by-stage/', params={'iin': iin, 'stage_type': stage_type}
+            ))
+            if status != 200 or not data:
+                return
+            level = data['level']
+            for question in data['questions']:
+                if question['options']:
+                    answers.append({
+                        'question_id': question['id'],
+                        'selected_option': rnd.choice(question['options'])['id'],
+                    })
+
+            if stage_type == STAGES[-1]:
+                record('submit', target.request(
+                    'POST', '/tests/submit/', body={'iin': iin, 'level': level, 'answers': answers}
+                ))
+
+            record('finish-stage', target.request(
+                'POST', '/tests/finish-stage/?' + urllib.parse.urlencode(
+                    {'iin': iin, 'stage_type': stage_type, 'level': level}
+                )
+            ))
+
+    def summarize(self, samples, wall_time, target, options):
+        endpoints = {}
+        for endpoint in ['register', 'questions-by-stage', 'finish-stage', 'submit']:
+            rows = [sample for sample in samples if sample[0] == endpoint]
+            latencies = [elapsed * 1000 for _, _, elapsed, _, _ in rows]
+            queries = [q for _, _, _, q, _ in rows if q is not None]
+            status_codes = {}
+            for _, status, *_ in rows:
+                status_codes[str(status)] = status_codes.get(str(status), 0) + 1
+            endpoints[endpoint] = {
+                'requests': len(rows),
+                'status_codes': status_codes,
+                'errors': sum(1 for _, status, *_ in rows if status >= 500),
+                'database_locked': sum(1 for *_, locked in rows if locked),
+                'latency_ms': {
+                    'mean': sum(latencies) / len(latencies) if latencies else None,
+                    'p50': percentile(latencies, 50),
+                    'p95': percentile(latencies, 95),
+                    'p99': percentile(latencies, 99),
+                    'max': max(latencies) if latencies else None,
+                },
+                'queries_per_request': {
+                    'mean': sum(queries) / len(queries) if queries else None,
+                    'max': max(queries) if queries else None,
+                },
+            }
+
+        try:
+            revision = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            revision = None
+
+        return {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'revision': revision,
+                'target': target.name,
+                'applicants': options['applicants'],
+                'concurrency': options['concurrency'],
+            },
+            'wall_time_s': wall_time,
+            'requests': len(samples),
+            'throughput_rps': len(samples) / wall_time if wall_time else None,
+            'applicants_per_s': options['applicants'] / wall_time if wall_time else None,
+            'database_locked': sum(1 for *_, locked in samples if locked),
+            'endpoints': endpoints,
+        }
+
+    def write_results(self, results):
+        self.stdout.write(
+            f'{results["requests"]} requests in {results["wall_time_s"]:.2f}s '
+            f'({results["throughput_rps"]:.1f} req/s, {results["applicants_per_s"]:.1f} applicants/s), '
+            f'database locked: {results["database_locked"]}'
+        )
+        self.stdout.write(f'{"endpoint":<20}{"n":>6}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"queries":>9}  status')
+        for endpoint, stats in results['endpoints'].items():
+            latency = stats['latency_ms']
+            queries = stats['queries_per_request']['mean']
+            self.stdout.write(
+                f'{endpoint:<20}{stats["requests"]:>6}'
+                + ''.join(f'{latency[key]:>10.1f}' if latency[key] is not None else f'{"-":>10}' for key in ('p50', 'p95', 'p99'))
+                + (f'{queries:>9.1f}' if queries is not None else f'{"-":>9}')
+                + f'  {stats["status_codes"]}'
+            )
@@ -0,0 +1,200 @@
+import json
+import platform
+import statistics
+import subprocess
+import timeit
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from performance.seeding import seed_question_bank
+from questions.cache import get_answer_key, get_question_ids
+from questions.models import Question
+from questions.sampling import SAMPLE_SIZES, sample_question_ids, seeded_random
+from questions.serializers import QuestionSerializer
+from tests.models import TestSession
+from tests.services import GradingService, TimeControlService
+
+# Фиксированный банк, чтобы результаты были сравнимы между машинами и ревизиями
+QUESTIONS_PER_POOL = 200
+LEVEL = 'B1'
+IIN = '950101300017'
+
+
+def bench_seed_and_sample():
+    """Seed derivation and index sampling for the three stages of one form"""
+    for question_type in SAMPLE_SIZES:
+        get_question_ids(LEVEL, question_type)
+
+    def run():
+        for question_type in SAMPLE_SIZES:
+            rnd = seeded_random(f'{IIN}-{LEVEL}-{question_type}')
+            sample_question_ids(rnd, LEVEL, question_type)
+    return run
+
+
+def bench_session_status():
+    """TimeControlService.get_session_status of a session in its second stage"""
+    now = timezone.now()
+    session = TestSession(
+        level=LEVEL,
+        started_at=now - timedelta(minutes=25),
+        grammar_started_at=now - timedelta(minutes=25),
+        grammar_finished_at=now - timedelta(minutes=8),
+        vocabulary_started_at=now - timedelta(minutes=8),
+    )
+    return lambda: TimeControlService.get_session_status(session)
+
+
+def bench_serialize_25():
+    """QuestionSerializer over 25 questions with prefetched options"""
+    questions = list(Question.objects.filter(level=LEVEL).order_by('id').prefetch_related('options')[:25])
+    return lambda: QuestionSerializer(questions, many=True).data
+
+
+def bench_grade_25():
+    """GradingService.grade of 25 answers against a warm answer key"""
+    answer_key = get_answer_key(LEVEL)
+    answers = []
+    for option_id, (question_id, _) in sorted(answer_key.options.items())[:100:4]:
+        answers.append({'question_id': question_id, 'selected_option': option_id})
+    return lambda: GradingService.grade(LEVEL, answers)
+
+
+BENCHMARKS = {
+    'seed_and_sample': bench_seed_and_sample,
+    'session_status': bench_session_status,
+    'serialize_25_questions': bench_serialize_25,
+    'grade_25_answers': bench_grade_25,
+}
+
+
+class Command(BaseCommand):
+    help = 'Time the pure-Python hot paths; save results as a JSON baseline or compare against one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='Run only these benchmarks')
+        parser.add_argument('--repeat', type=int, default=7, help='Timed runs per benchmark')
+        parser.add_argument(
+            '--min-time',
+            type=float,
+            default=0.2,
+            help='Loops per run are calibrated so that one run takes at least this many seconds'
+        )
+        parser.add_argument('--save', type=str, help='Write the results to this JSON file')
+        parser.add_argument('--compare', type=str, help='Baseline JSON file to compare against')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=10.0,
+            help='Median slowdown in percent that counts as a regression'
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read baseline {options["compare"]}: {e}')
+
+        names = options['only'] or list(BENCHMARKS)
+        setup_test_environment()
+        # Process-local cache, as in performance/tests.py: seeding must not bump the bank
+        # version shared with running workers, and the hot paths are timed without cache I/O
+        cache_override = override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+        cache_override.enable()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            seed_question_bank(QUESTIONS_PER_POOL)
+            results = {name: self.run_benchmark(name, options) for name in names}
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            cache_override.disable()
+            teardown_test_environment()
+
+        report = {'meta': self.meta(), 'benchmarks': results}
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["save"]}'))
+
+        if baseline is not None:
+            self.compare(baseline, report, options['threshold'])
+
+    def run_benchmark(self, name, options):
+        func = BENCHMARKS[name]()
+        func()  # warm-up
+        timer = timeit.Timer(func)
+
+        loops = 1
+        while True:
+            elapsed = timer.timeit(loops)
+            if elapsed >= options['min_time']:
+                break
+            loops *= 10 if elapsed < options['min_time'] / 10 else 2
+
+        runs = [seconds / loops * 1e6 for seconds in timer.repeat(repeat=options['repeat'], number=loops)]
+        result = {
+            'loops': loops,
+            'repeat': options['repeat'],
+            'per_call_us': {
+                'min': min(runs),
+                'median': statistics.median(runs),
+                'mean': statistics.mean(runs),
+                'stdev': statistics.stdev(runs) if len(runs) > 1 else 0.0,
+            },
+        }
+        per_call = result['per_call_us']
+        self.stdout.write(
+            f'{name:<26}{per_call["median"]:>12.2f} us  (min {per_call["min"]:.2f}, '
+            f'stdev {per_call["stdev"]:.2f}, {loops} loops x {options["repeat"]})'
+        )
+        return result
+
+    def meta(self):
+        try:
+            revision = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            revision = None
+        return {
+            'created_at': timezone.now().isoformat(),
+            'revision': revision,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'machine': platform.platform(),
+        }
+
+    def compare(self, baseline, report, threshold):
+        self.stdout.write('')
+        self.stdout.write(
+            f'Compared with {baseline["meta"].get("revision") or "baseline"} '
+            f'(regression threshold {threshold:g}%)'
+        )
+        regressions = []
+        for name, result in report['benchmarks'].items():
+            old = baseline['benchmarks'].get(name)
+            if old is None:
+                self.stdout.write(f'  {name:<26}  not in baseline')
+                continue
+            before, after = old['per_call_us']['median'], result['per_call_us']['median']
+            change = (after - before) / before * 100
+            line = f'  {name:<26}{before:>10.2f} -> {after:>10.2f} us  {change:+.1f}%'
+            if change > threshold:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            elif change < -threshold:
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(f'Regressions above {threshold:g}%: {", ".join(regressions)}')
+        self.stdout.write(self.style.SUCCESS('No regressions'))
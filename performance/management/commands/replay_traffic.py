@@ -0,0 +1,259 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+from django.core.management.base import BaseCommand, CommandError
+
+from performance.targets import HttpTarget, InProcessTarget, percentile
+from performance.traffic import read_traffic
+
+
+class Command(BaseCommand):
+    help = 'Replay a recorded traffic log at 1x, Nx or maximum speed, keeping the order of each applicant'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', type=str, help='Traffic log written by TrafficRecordingMiddleware')
+        parser.add_argument(
+            '--speed',
+            type=float,
+            default=1.0,
+            help='Time scale: 1 = as recorded, 10 = ten times faster, 0 = as fast as possible'
+        )
+        parser.add_argument(
+            '--base-url',
+            type=str,
+            help='Replay against a server (e.g. http://127.0.0.1:8000) instead of the in-process WSGI app'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=100,
+            help='Requests in flight at the same time; should cover the recorded peak of concurrent requests'
+        )
+        parser.add_argument(
+            '--allow-local-writes',
+            action='store_true',
+            help='Replay in-process against the configured database (required without --base-url): recorded '
+                 'registrations, answers and results are written to it'
+        )
+        parser.add_argument(
+            '--keep-data',
+            action='store_true',
+            help='In-process: keep the applicants the replay created (deleted by default; '
+                 'sessions and answers added to applicants that already existed stay)'
+        )
+        parser.add_argument('--output', type=str, help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        if options['speed'] < 0:
+            raise CommandError('--speed must be 0 (as fast as possible) or positive')
+        try:
+            records = read_traffic(options['file'])
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["file"]}: {e}')
+        if not records:
+            raise CommandError('The traffic log is empty')
+        if not options['base_url'] and not options['allow_local_writes']:
+            raise CommandError(
+                'Without --base-url the replay writes recorded registrations, answers and results into the '
+                'configured database. Pass --allow-local-writes to do that, or replay against a server.'
+            )
+
+        target = HttpTarget(options['base_url']) if options['base_url'] else InProcessTarget()
+        applicants = {record['applicant'] for record in records if record.get('applicant')}
+        existing = self.existing_applicants(applicants) if isinstance(target, InProcessTarget) else set()
+
+        recorded_span = records[-1]['ts'] - records[0]['ts']
+        self.stdout.write(
+            f'Replaying {len(records)} requests of {len(applicants)} applicants '
+            f'(recorded over {recorded_span:.1f}s) at '
+            + (f'{options["speed"]:g}x' if options['speed'] else 'maximum speed') + f' against {target.name}...'
+        )
+        started = time.perf_counter()
+        try:
+            samples, failures = self.replay(records, target, options['speed'], options['concurrency'], started)
+            wall_time = time.perf_counter() - started
+        finally:
+            if isinstance(target, InProcessTarget) and not options['keep_data']:
+                self.delete_applicants(applicants - existing)
+        if failures:
+            self.stdout.write(self.style.ERROR(f'{len(failures)} requests could not be sent, e.g. {failures[0]}'))
+        if not samples:
+            raise CommandError('No request was replayed')
+
+        results = self.summarize(samples, wall_time, recorded_span, target, options)
+        self.write_results(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+    def replay(self, records, target, speed, concurrency, started):
+        """Issue every request at its own recorded time (scaled by ``speed``).
+
+        This thread only dispatches; ``concurrency`` worker threads run the
+        requests, so overlapping applicants overlap as they did when recorded.
+        A request whose applicant still has one in flight waits for it and
+        starts right after, keeping each applicant's order. Returns the samples
+        ``(record, status, elapsed, lag, queries, locked)`` and the errors of
+        requests that could not be sent.
+        """
+        first_ts = records[0]['ts']
+        samples = []
+        failures = []
+        work = queue.Queue()
+        in_flight = {}  # applicant -> records waiting for the request in flight
+        lock = threading.Lock()
+
+        def scheduled_at(record):
+            return (record['ts'] - first_ts) / speed if speed else 0.0
+
+        def run(record, key):
+            lag = max(0.0, time.perf_counter() - started - scheduled_at(record)) if speed else 0.0
+            path = record['path'] + (f'?{record["query"]}' if record['query'] else '')
+            try:
+                status, _, elapsed, queries, locked = target.request(
+                    record['method'], path, body=record.get('body', b''),
+                    content_type=record.get('content_type') or 'application/json',
+                )
+                with lock:
+                    samples.append((record, status, elapsed, lag, queries, locked))
+            except Exception as e:
+                # Connection refused and the like: keep the workers alive, report after the run
+                with lock:
+                    failures.append(f'{record["method"]} {path}: {e}')
+            finally:
+                if key is not None:
+                    with lock:
+                        waiting = in_flight[key]
+                        if waiting:
+                            work.put((waiting.popleft(), key))
+                        else:
+                            del in_flight[key]
+
+        def worker():
+            try:
+                while True:
+                    item = work.get()
+                    if item is None:
+                        return
+                    try:
+                        run(*item)
+                    finally:
+                        work.task_done()
+            finally:
+                target.finish_thread()
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+
+        for record in records:
+            delay = scheduled_at(record) - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+            key = record.get('applicant')
+            if key is not None:
+                with lock:
+                    if key in in_flight:
+                        in_flight[key].append(record)
+                        continue
+                    in_flight[key] = deque()
+            work.put((record, key))
+
+        work.join()
+        for _ in threads:
+            work.put(None)
+        for thread in threads:
+            thread.join()
+        return samples, failures
+
+    def existing_applicants(self, iins, chunk_size=500):
+        from users.models import Applicant
+
+        iins = sorted(iins)
+        existing = set()
+        for start in range(0, len(iins), chunk_size):
+            existing.update(Applicant.objects.filter(iin__in=iins[start:start + chunk_size]).values_list('iin', flat=True))
+        return existing
+
+    def delete_applicants(self, iins, chunk_size=500):
+        """Remove the applicants the replay registered, with their sessions, answers and results"""
+        from users.models import Applicant
+
+        iins = sorted(iins)
+        for start in range(0, len(iins), chunk_size):
+            Applicant.objects.filter(iin__in=iins[start:start + chunk_size]).delete()
+        if iins:
+            self.stdout.write(f'Deleted {len(iins)} applicants created by the replay (use --keep-data to keep them)')
+
+    def summarize(self, samples, wall_time, recorded_span, target, options):
+
+        endpoints = {}
+        for record, status, elapsed, lag, queries, locked in samples:
+            stats = endpoints.setdefault(f'{record["method"]} {record["path"]}', {
+                'latencies': [], 'recorded': [], 'queries': [], 'status_mismatches': 0, 'errors': 0, 'locked': 0,
+            })
+            stats['latencies'].append(elapsed * 1000)
+            stats['recorded'].append(record['duration_ms'])
+            if queries is not None:
+                stats['queries'].append(queries)
+            stats['status_mismatches'] += status != record['status']
+            stats['errors'] += status >= 500
+            stats['locked'] += locked
+
+        lags = [lag * 1000 for *_, lag, _, _ in samples]
+        return {
+            'meta': {
+                'file': options['file'],
+                'speed': options['speed'],
+                'target': target.name,
+                'concurrency': options['concurrency'],
+            },
+            'requests': len(samples),
+            'recorded_span_s': recorded_span,
+            'wall_time_s': wall_time,
+            'throughput_rps': len(samples) / wall_time if wall_time else None,
+            'schedule_lag_ms': {'p95': percentile(lags, 95), 'max': max(lags) if lags else None},
+            'endpoints': {
+                endpoint: {
+                    'requests': len(stats['latencies']),
+                    'status_mismatches': stats['status_mismatches'],
+                    'errors': stats['errors'],
+                    'database_locked': stats['locked'],
+                    'latency_ms': {
+                        'p50': percentile(stats['latencies'], 50),
+                        'p95': percentile(stats['latencies'], 95),
+                        'p99': percentile(stats['latencies'], 99),
+                    },
+                    'recorded_latency_ms': {
+                        'p50': percentile(stats['recorded'], 50),
+                        'p95': percentile(stats['recorded'], 95),
+                    },
+                    'queries_per_request': sum(stats['queries']) / len(stats['queries']) if stats['queries'] else None,
+                }
+                for endpoint, stats in sorted(endpoints.items())
+            },
+        }
+
+    def write_results(self, results):
+        lag = results['schedule_lag_ms']
+        self.stdout.write(
+            f'{results["requests"]} requests in {results["wall_time_s"]:.2f}s '
+            f'({results["throughput_rps"]:.1f} req/s), schedule lag p95 {lag["p95"]:.1f}ms'
+        )
+        if results['meta']['speed'] and lag['p95'] > 100:
+            self.stdout.write(self.style.WARNING(
+                'Requests started late: raise --concurrency, or the target cannot keep up at this speed'
+            ))
+        self.stdout.write(
+            f'{"endpoint":<40}{"n":>6}{"p50 ms":>10}{"p95 ms":>10}{"rec p50":>10}{"rec p95":>10}{"mismatch":>10}'
+        )
+        for endpoint, stats in results['endpoints'].items():
+            latency, recorded = stats['latency_ms'], stats['recorded_latency_ms']
+            self.stdout.write(
+                f'{endpoint:<40}{stats["requests"]:>6}{latency["p50"]:>10.1f}{latency["p95"]:>10.1f}'
+                f'{recorded["p50"]:>10.1f}{recorded["p95"]:>10.1f}{stats["status_mismatches"]:>10}'
+            )
@@ -0,0 +1,84 @@
+import glob
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Summarise the slow-query log per query fingerprint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            type=str,
+            default=settings.SLOW_QUERY_LOG_FILE,
+            help='Log file; rotated files (.1, .2, ...) are read as well'
+        )
+        parser.add_argument(
+            '--sort',
+            choices=['total', 'count', 'max', 'mean'],
+            default='total',
+            help='Order fingerprints by total/count/max/mean duration'
+        )
+        parser.add_argument('--top', type=int, default=20, help='Number of fingerprints to show')
+        parser.add_argument('--plans', action='store_true', help='Show the latest query plan of every fingerprint')
+
+    def handle(self, *args, **options):
+        files = [path for path in glob.glob(glob.escape(options['file']) + '*') if os.path.isfile(path)]
+        if not files:
+            raise CommandError(f'No slow-query log found at {options["file"]}')
+
+        groups = {}
+        bad_lines = 0
+        for path in sorted(files):
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        bad_lines += 1
+                        continue
+                    group = groups.setdefault(record['fingerprint'], {
+                        'sql': record['normalized_sql'],
+                        'durations': [],
+                        'views': {},
+                        'latest': record,
+                    })
+                    group['durations'].append(record['duration_ms'])
+                    view = record.get('view') or '-'
+                    group['views'][view] = group['views'].get(view, 0) + 1
+                    if record['ts'] >= group['latest']['ts']:
+                        group['latest'] = record
+
+        sort_keys = {
+            'total': lambda g: sum(g['durations']),
+            'count': lambda g: len(g['durations']),
+            'max': lambda g: max(g['durations']),
+            'mean': lambda g: sum(g['durations']) / len(g['durations']),
+        }
+        ordered = sorted(groups.items(), key=lambda item: sort_keys[options['sort']](item[1]), reverse=True)
+
+        total_queries = sum(len(group['durations']) for group in groups.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{total_queries} slow queries, {len(groups)} fingerprints in {len(files)} file(s)'
+        ))
+        if bad_lines:
+            self.stdout.write(self.style.WARNING(f'{bad_lines} unreadable lines skipped'))
+
+        for query_hash, group in ordered[:options['top']]:
+            durations = group['durations']
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{query_hash}  count={len(durations)}  total={sum(durations):.1f}ms  '
+                f'mean={sum(durations) / len(durations):.1f}ms  max={max(durations):.1f}ms'
+            ))
+            views = ', '.join(f'{view} ({count})' for view, count in sorted(
+                group['views'].items(), key=lambda item: -item[1]
+            ))
+            self.stdout.write(f'  views: {views}')
+            self.stdout.write(f'  sql:   {group["sql"][:500]}')
+            if options['plans']:
+                for line in group['latest']['plan']:
+                    self.stdout.write(f'    {line}')
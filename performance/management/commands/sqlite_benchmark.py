@@ -0,0 +1,161 @@
+import copy
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.utils import timezone
+
+from performance.targets import percentile
+from questions.models import Option
+from tests.models import TestResult, TestSession, UserAnswer
+from users.models import Applicant
+
+
+def read(alias, rnd, iins, options_pool):
+    """session-status and results of one applicant"""
+    applicant = Applicant.objects.using(alias).get(iin=rnd.choice(iins))
+    TestSession.objects.using(alias).filter(applicant=applicant, finished_at__isnull=True).first()
+    list(TestResult.objects.using(alias).filter(applicant=applicant))
+
+
+def write(alias, rnd, iins, options_pool):
+    """A submission: 25 answers and the applicant update in one transaction"""
+    iin = rnd.choice(iins)
+    with transaction.atomic(using=alias):
+        UserAnswer.objects.using(alias).bulk_create([
+            UserAnswer(applicant_id=iin, question_id=question_id, selected_option_id=option_id, is_correct=is_correct)
+            for question_id, option_id, is_correct in rnd.sample(options_pool, 25)
+        ])
+        Applicant.objects.using(alias).filter(iin=iin).update(updated_at=timezone.now())
+
+
+def run_worker(kind, seed, alias, settings_dict, start_at, duration, iins, options_pool):
+    """One worker process, like a gunicorn worker serving one request at a time"""
+    connections.settings[alias] = settings_dict
+    connection = connections[alias]
+    operation = read if kind == 'read' else write
+    rnd = random.Random(seed)
+    latencies, locked = [], 0
+
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = start_at + duration
+    try:
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                operation(alias, rnd, iins, options_pool)
+                latencies.append((time.perf_counter() - started) * 1000)
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                locked += 1
+            # What request_finished does after every request
+            connection.close_if_unusable_or_obsolete()
+    finally:
+        connection.close()
+    return kind, latencies, locked
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent read/write throughput of the SQLite profiles in settings.SQLITE_PROFILES'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles',
+            nargs='+',
+            default=list(settings.SQLITE_PROFILES),
+            choices=list(settings.SQLITE_PROFILES),
+            help='Profiles to compare'
+        )
+        parser.add_argument('--readers', type=int, default=6, help='Processes running session-status style reads')
+        parser.add_argument('--writers', type=int, default=2, help='Processes submitting 25 answers per write')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per profile')
+
+    def handle(self, *args, **options):
+        default = connections.settings['default']
+        if default['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('The default database is not SQLite')
+
+        # Данные для запросов берутся из исходной базы один раз
+        iins = list(TestSession.objects.values_list('applicant_id', flat=True).distinct()[:5000])
+        options_pool = list(Option.objects.values_list('question_id', 'id', 'is_correct')[:5000])
+        if not iins or not options_pool:
+            raise CommandError('Not enough data; run generate_data first')
+        self.iins, self.options_pool = iins, options_pool
+        # Worker processes open their own connections
+        connections.close_all()
+
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in options['profiles']:
+                path = os.path.join(directory, f'{profile}.sqlite3')
+                self.copy_database(str(default['NAME']), path)
+                alias = f'benchmark_{profile}'
+                connections.settings[alias] = self.profile_settings(default, profile, path)
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'Profile {profile}: {options["readers"]} readers, {options["writers"]} writers, '
+                    f'{options["duration"]:g}s'
+                ))
+                results[profile] = self.run_profile(alias, options)
+                self.write_profile(results[profile], options['duration'])
+
+        if len(results) > 1:
+            base_name, base = next(iter(results.items()))
+            self.stdout.write('')
+            for profile, result in list(results.items())[1:]:
+                for kind in ('read', 'write'):
+                    before, after = len(base[kind]['latencies']), len(result[kind]['latencies'])
+                    ratio = after / before if before else float('inf')
+                    self.stdout.write(self.style.SUCCESS(
+                        f'{kind}s: {profile} {after} vs {base_name} {before} ({ratio:.1f}x)'
+                    ))
+
+    def copy_database(self, source, target):
+        """Consistent copy with the backup API, always starting in rollback-journal mode"""
+        with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+            src.backup(dst)
+            dst.execute('PRAGMA journal_mode=DELETE')
+        src.close()
+        dst.close()
+
+    def profile_settings(self, default, profile, path):
+        settings_dict = copy.deepcopy(default)
+        settings_dict.update({'NAME': path, 'OPTIONS': {}, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False})
+        settings_dict.update(copy.deepcopy(settings.SQLITE_PROFILES[profile]))
+        return settings_dict
+
+    def run_profile(self, alias, options):
+        result = {kind: {'latencies': [], 'locked': 0} for kind in ('read', 'write')}
+        kinds = ['read'] * options['readers'] + ['write'] * options['writers']
+        # Workers start together once every process is up
+        start_at = time.time() + 3
+        with ProcessPoolExecutor(max_workers=len(kinds), initializer=django.setup) as executor:
+            futures = [
+                executor.submit(run_worker, kind, seed, alias, connections.settings[alias], start_at,
+                                options['duration'], self.iins, self.options_pool)
+                for seed, kind in enumerate(kinds)
+            ]
+            for future in futures:
+                kind, latencies, locked = future.result()
+                result[kind]['latencies'].extend(latencies)
+                result[kind]['locked'] += locked
+        return result
+
+    def write_profile(self, result, duration):
+        for kind in ('read', 'write'):
+            latencies = result[kind]['latencies']
+            if not latencies:
+                self.stdout.write(self.style.ERROR(f'  {kind}s: none completed, {result[kind]["locked"]} locked'))
+                continue
+            self.stdout.write(
+                f'  {kind}s: {len(latencies) / duration:>8.1f}/s  p50 {percentile(latencies, 50):.2f}ms  '
+                f'p95 {percentile(latencies, 95):.2f}ms  p99 {percentile(latencies, 99):.2f}ms  '
+                f'database locked: {result[kind]["locked"]}'
+            )
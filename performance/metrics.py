@@ -0,0 +1,81 @@
+import threading
+from bisect import bisect_left
+
+# Границы корзин гистограмм (секунды и количество запросов к БД)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+METRICS = {
+    'request_duration_seconds': ('Total time spent in Django per request', DURATION_BUCKETS),
+    'db_duration_seconds': ('Time spent executing SQL per request', DURATION_BUCKETS),
+    'serialize_duration_seconds': ('Time spent rendering the response body per request', DURATION_BUCKETS),
+    'db_queries': ('Number of SQL queries per request', QUERY_BUCKETS),
+}
+
+PREFIX = 'kelet_'
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """In-process histograms per (metric, route, method), one registry per worker"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, method, status, values):
+        with self._lock:
+            for metric, value in values.items():
+                key = (metric, route, method)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(METRICS[metric][1])
+                histogram.observe(value)
+            key = ('responses_total', route, method, status)
+            self._histograms[key] = self._histograms.get(key, 0) + 1
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            items = sorted(self._histograms.items())
+
+        lines = []
+        for metric, (description, _) in METRICS.items():
+            name = PREFIX + metric
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} histogram')
+            for key, histogram in items:
+                if key[0] != metric:
+                    continue
+                labels = f'route="{key[1]}",method="{key[2]}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+        name = PREFIX + 'responses_total'
+        lines.append(f'# HELP {name} Responses by route, method and status code')
+        lines.append(f'# TYPE {name} counter')
+        for key, count in items:
+            if key[0] == 'responses_total':
+                lines.append(f'{name}{{route="{key[1]}",method="{key[2]}",status="{key[3]}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
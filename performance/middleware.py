@@ -0,0 +1,149 @@
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .metrics import registry
+from .slow_queries import SlowQueryLogger
+from .traffic import MAX_RECORDED_BODY, TrafficLog, applicant_key
+
+
+class PerformanceMiddleware:
+    """
+    Measures every request: SQL query count, SQL time, response rendering
+    (serialization) time and total time.
+
+    Opt-in: the numbers are sent back in a ``Server-Timing`` header only with
+    ``SERVER_TIMING``, and aggregated per route into the histograms of the
+    ``/metrics`` endpoint only with ``METRICS_ENABLED``. With neither the
+    middleware is not used at all.
+    """
+
+    def __init__(self, get_response):
+        self.server_timing = settings.SERVER_TIMING
+        self.collect_metrics = settings.METRICS_ENABLED
+        if not (self.server_timing or self.collect_metrics):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = request._performance = {'queries': 0, 'db': 0.0, 'serialize': 0.0}
+
+        def measure_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats['queries'] += 1
+                stats['db'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(measure_query):
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'db;desc="{stats["queries"]} queries";dur={stats["db"] * 1000:.1f}, '
+                f'serialize;dur={stats["serialize"] * 1000:.1f}, '
+                f'total;dur={total * 1000:.1f}'
+            )
+        if not self.collect_metrics:
+            return response
+
+        match = request.resolver_match
+        registry.observe(
+            route=match.route if match else 'unmatched',
+            method=request.method,
+            status=response.status_code,
+            values={
+                'request_duration_seconds': total,
+                'db_duration_seconds': stats['db'],
+                'serialize_duration_seconds': stats['serialize'],
+                'db_queries': stats['queries'],
+            },
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns
+        stats = getattr(request, '_performance', None)
+        if stats is not None:
+            render_started = time.perf_counter()
+
+            def rendered(response):
+                stats['serialize'] += time.perf_counter() - render_started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+
+class SlowQueryLogMiddleware:
+    """
+    Opt-in slow-query log: enabled only when ``SLOW_QUERY_THRESHOLD_MS`` is set.
+
+    Queries over the threshold are written to ``SLOW_QUERY_LOG_FILE`` (see the
+    ``performance.slow_queries`` logger); summarise them with
+    ``python manage.py slow_query_report``.
+    """
+
+    def __init__(self, get_response):
+        threshold_ms = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+        if threshold_ms is None:
+            raise MiddlewareNotUsed
+        os.makedirs(os.path.dirname(settings.SLOW_QUERY_LOG_FILE), exist_ok=True)
+        self.get_response = get_response
+        self.threshold_ms = threshold_ms
+
+    def __call__(self, request):
+        with connection.execute_wrapper(SlowQueryLogger(self.threshold_ms, request)):
+            return self.get_response(request)
+
+
+class TrafficRecordingMiddleware:
+    """
+    Opt-in traffic recorder: enabled only when ``TRAFFIC_RECORD_FILE`` is set.
+
+    Appends method, path, query string, body (or its sha256), status and timing
+    of every request to a JSON-lines file that ``replay_traffic`` re-issues.
+    """
+
+    def __init__(self, get_response):
+        path = getattr(settings, 'TRAFFIC_RECORD_FILE', None)
+        if not path:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.log = TrafficLog(path)
+        self.record_bodies = settings.TRAFFIC_RECORD_BODIES == 'full'
+        self.exclude = tuple(settings.TRAFFIC_RECORD_EXCLUDE)
+
+    def __call__(self, request):
+        if request.path.startswith(self.exclude):
+            return self.get_response(request)
+
+        # Read the body before the view consumes the stream
+        body = request.body
+        query = request.META.get('QUERY_STRING', '')
+        timestamp = time.time()
+        started = time.perf_counter()
+        response = self.get_response(request)
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        record = {
+            'ts': timestamp,
+            'method': request.method,
+            'path': request.path,
+            'query': query,
+            'content_type': request.content_type,
+            'body_sha256': hashlib.sha256(body).hexdigest() if body else None,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 3),
+            'applicant': applicant_key(query, body, request.content_type),
+        }
+        if self.record_bodies and body and len(body) <= MAX_RECORDED_BODY:
+            record['body'] = body.decode('utf-8', errors='replace')
+        self.log.append(record)
+        return response
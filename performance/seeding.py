@@ -0,0 +1,298 @@
+"""Fast synthetic data for benchmarks and the query-budget harness.
+
+Rows are written with ``cursor.executemany`` and explicit primary keys rather
+than model instances, so millions of answers take seconds, not minutes.
+"""
+import random
+from datetime import date, timedelta
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from questions.cache import bump_bank_version_on_commit
+from questions.models import Option, Question, QuestionType
+from questions.sampling import SAMPLE_SIZES
+from questions.utils import add_option, new_question, question_content_hash
+from tests.models import TestResult, TestSession, UserAnswer
+from tests.services import LEVEL_ORDER, TimeControlService, get_next_level
+from users.models import Applicant
+
+QUESTION_TYPES = [question_type for question_type, _ in QuestionType.choices]
+OPTION_LABELS = 'ABCD'
+PASS_SCORE = 0.7
+
+FIRST_NAMES = ['Aruzhan', 'Alikhan', 'Dana', 'Nursultan', 'Aigerim', 'Daniyar', 'Madina', 'Yerlan',
+               'Асель', 'Тимур', 'Жанна', 'Ерасыл', 'Камила', 'Арман', 'Dilnaz', 'Sultan']
+LAST_NAMES = ['Nurlanov', 'Abenova', 'Seitkali', 'Zhakupova', 'Omarov', 'Tokayeva', 'Bekov',
+              'Серикбаев', 'Ахметова', 'Касымов', 'Муратова', 'Kim', 'Ivanova', 'Sadykov']
+
+IIN_WEIGHTS = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11)
+IIN_WEIGHTS_RETRY = (3, 4, 5, 6, 7, 8, 9, 10, 11, 1, 2)
+
+
+def iin_check_digit(digits):
+    """Check digit of the first 11 IIN digits, or None if the number cannot be issued"""
+    check = sum(int(d) * w for d, w in zip(digits, IIN_WEIGHTS)) % 11
+    if check == 10:
+        check = sum(int(d) * w for d, w in zip(digits, IIN_WEIGHTS_RETRY)) % 11
+        if check == 10:
+            return None
+    return check
+
+
+class IINGenerator:
+    """Unique, well-formed IINs: birth date, century/gender digit, serial, check digit"""
+
+    def __init__(self, rnd, existing=(), first_birth_date=date(1995, 1, 1), days=5000):
+        self.rnd = rnd
+        self.existing = set(existing)
+        self.first_birth_date = first_birth_date
+        self.days = days
+        self.serials = {}
+
+    def __next__(self):
+        while True:
+            birth_date = self.first_birth_date + timedelta(days=self.rnd.randrange(self.days))
+            female = self.rnd.random() < 0.5
+            century = (3 if birth_date.year < 2000 else 5) + female
+            prefix = f'{birth_date:%y%m%d}{century}'
+            serial = self.serials.get(prefix, 0) + 1
+            self.serials[prefix] = serial
+            digits = f'{prefix}{serial:04d}'
+            check = iin_check_digit(digits)
+            iin = f'{digits}{check}'
+            if check is not None and iin not in self.existing:
+                self.existing.add(iin)
+                return iin
+
+    def __iter__(self):
+        return self
+
+
+def insert_rows(model, field_names, rows, batch_size=10000):
+    """INSERT plain tuples with ``executemany``, ``batch_size`` rows per call.
+
+    Returns:
+        int: Number of inserted rows
+    """
+    opts = model._meta
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(opts.get_field(name).column) for name in field_names)
+    placeholders = ', '.join(['%s'] * len(field_names))
+    sql = f'INSERT INTO {quote(opts.db_table)} ({columns}) VALUES ({placeholders})'
+
+    inserted = 0
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while batch := list(islice(rows, batch_size)):
+            cursor.executemany(sql, batch)
+            inserted += len(batch)
+    return inserted
+
+
+def next_id(model):
+    return (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+
+
+def reset_sequences(*models):
+    # Explicit IDs leave PostgreSQL-style sequences behind; SQLite needs nothing
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+def seed_question_bank(questions_per_pool, seed=0, batch_size=10000):
+    """Create ``questions_per_pool`` questions for every (level, type) pair, four options each.
+
+    Returns:
+        int: Number of created questions
+    """
+    rnd = random.Random(f'bank-{seed}')
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    question_id = next_id(Question)
+    option_id = next_id(Option)
+    questions, options = [], []
+
+    for level in LEVEL_ORDER:
+        for question_type in QUESTION_TYPES:
+            for _ in range(questions_per_pool):
+                paragraph = (
+                    f'Synthetic reading passage #{question_id}. ' * 3
+                    if question_type == QuestionType.READING else None
+                )
+                prompt = f'Synthetic {level} {question_type} question #{question_id}'
+                record = new_question([], question_type, level, prompt, paragraph)
+                correct = rnd.randrange(len(OPTION_LABELS))
+                for index, label in enumerate(OPTION_LABELS):
+                    add_option(record, label, f'Option {label} of #{question_id}', index == correct)
+                    options.append((option_id, question_id, label, record['options'][-1]['text'], index == correct))
+                    option_id += 1
+                questions.append((
+                    question_id, question_type, level, prompt, paragraph,
+                    question_content_hash(record), True, now,
+                ))
+                question_id += 1
+
+    with transaction.atomic():
+        insert_rows(Question, ['id', 'type', 'level', 'prompt', 'paragraph', 'content_hash', 'is_active', 'created_at'],
+                    questions, batch_size)
+        insert_rows(Option, ['id', 'question', 'label', 'text', 'is_correct'], options, batch_size)
+        reset_sequences(Question, Option)
+        bump_bank_version_on_commit()
+    return len(questions)
+
+
+def load_answer_pools():
+    """{(level, type): [(question_id, correct_option_id, [wrong_option_ids])]} of the active bank"""
+    questions = {}
+    rows = Option.objects.filter(question__is_active=True).values_list(
+        'question_id', 'question__level', 'question__type', 'id', 'is_correct'
+    ).order_by('question_id', 'id')
+    for question_id, level, question_type, option_id, is_correct in rows:
+        entry = questions.setdefault(question_id, (level, question_type, [], []))
+        entry[2 if is_correct else 3].append(option_id)
+
+    pools = {}
+    for question_id, (level, question_type, correct, wrong) in questions.items():
+        if correct:
+            pools.setdefault((level, question_type), []).append((question_id, correct[0], wrong))
+    return pools
+
+
+def seed_cohort(applicants, seed=0, active_share=0.02, idle_share=0.05, days=90, chunk_size=5000,
+                batch_size=10000, progress=None):
+    """Create applicants with realistic test histories.
+
+    Every applicant registers at A1 and takes tests the way the API hands them
+    out (``get_next_level``): 25 answers per test, a pass at 70% promotes,
+    anything else completes the applicant. ``active_share`` of the applicants
+    are in the middle of a test (some of those sessions are long expired),
+    ``idle_share`` registered but never started.
+
+    Args:
+        applicants: Number of applicants to create
+        seed: Seed of the random generator; the same seed gives the same data
+        progress: Optional callable receiving the stats dict after each chunk
+
+    Returns:
+        list: IINs of the created applicants, in creation order
+    """
+    rnd = random.Random(f'cohort-{seed}')
+    pools = load_answer_pools()
+    if not pools:
+        raise ValueError('The question bank is empty; seed questions first')
+
+    adapt = connection.ops.adapt_datetimefield_value
+    now = timezone.now()
+    window = timedelta(days=days)
+    iins = IINGenerator(rnd, Applicant.objects.values_list('iin', flat=True))
+    session_id = next_id(TestSession)
+    stats = {'applicants': 0, 'sessions': 0, 'answers': 0, 'results': 0}
+    created = []
+
+    for start in range(0, applicants, chunk_size):
+        applicant_rows, session_rows, answer_rows, result_rows = [], [], [], []
+
+        for _ in range(min(chunk_size, applicants - start)):
+            iin = next(iins)
+            created.append(iin)
+            registered_at = now - window * rnd.random()
+            level, is_completed = LEVEL_ORDER[0], False
+            updated_at = registered_at
+            ability = rnd.uniform(0.45, 0.97)
+            roll = rnd.random()
+            taking_tests = roll >= idle_share
+            stop_mid_test = roll < idle_share + active_share
+            started_at = registered_at + timedelta(minutes=rnd.uniform(1, 30))
+            tested_levels = set()
+
+            while taking_tests and not is_completed and started_at < now:
+                test_level = get_next_level(level)
+                if test_level in tested_levels:
+                    # C1 is handed out again after passing it; the API rejects a second result
+                    break
+                tested_levels.add(test_level)
+                stages = {}
+                moment = started_at
+                for stage in ('Grammar', 'Vocabulary', 'Reading'):
+                    limit = TimeControlService.STAGE_TIME_LIMITS[stage]
+                    finished = moment + timedelta(minutes=rnd.uniform(limit * 0.3, limit))
+                    stages[stage] = (moment, finished)
+                    moment = finished
+
+                if stop_mid_test:
+                    # The last test is abandoned or still running: no answers, no result
+                    stage_count = rnd.randrange(1, 4)
+                    times = [stages[stage] for stage in ('Grammar', 'Vocabulary', 'Reading')[:stage_count]]
+                    flat = [value for pair in times for value in pair][:-1] + [None]
+                    flat = [value if value and value <= now else None for value in flat]
+                    flat += [None] * (6 - len(flat))
+                    session_rows.append((session_id, iin, test_level, adapt(started_at), None, *map(adapt, flat)))
+                    session_id += 1
+                    break
+
+                finished_at = stages['Reading'][1]
+                session_rows.append((
+                    session_id, iin, test_level, adapt(started_at), adapt(finished_at),
+                    *(adapt(value) for stage in ('Grammar', 'Vocabulary', 'Reading') for value in stages[stage]),
+                ))
+
+                answered_at = adapt(finished_at)
+                correct_count = total = 0
+                for question_type, size in SAMPLE_SIZES.items():
+                    pool = pools.get((test_level, question_type), [])
+                    for question_id, correct_id, wrong_ids in rnd.sample(pool, min(size, len(pool))):
+                        is_correct = rnd.random() < ability or not wrong_ids
+                        option_id = correct_id if is_correct else rnd.choice(wrong_ids)
+                        answer_rows.append((iin, session_id, question_id, option_id, is_correct, answered_at))
+                        correct_count += is_correct
+                        total += 1
+                session_id += 1
+
+                result_at = adapt(finished_at)
+                result_rows.append((iin, test_level, correct_count, total, result_at, result_at))
+                updated_at = finished_at
+
+                # Same rules as TestResult.update_applicant
+                current_idx, passed_idx = LEVEL_ORDER.index(level), LEVEL_ORDER.index(test_level)
+                if total and correct_count / total >= PASS_SCORE:
+                    if passed_idx == current_idx + 1:
+                        level = test_level
+                    elif passed_idx == len(LEVEL_ORDER) - 1:
+                        is_completed = True
+                else:
+                    is_completed = True
+                started_at = finished_at + timedelta(days=rnd.uniform(0.5, 10))
+
+            applicant_rows.append((
+                iin, rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES), level, is_completed,
+                adapt(registered_at), adapt(updated_at),
+            ))
+
+        with transaction.atomic():
+            stats['applicants'] += insert_rows(
+                Applicant, ['iin', 'first_name', 'last_name', 'current_level', 'is_completed', 'created_at', 'updated_at'],
+                applicant_rows, batch_size,
+            )
+            stats['sessions'] += insert_rows(
+                TestSession, ['id', 'applicant', 'level', 'started_at', 'finished_at',
+                              'grammar_started_at', 'grammar_finished_at', 'vocabulary_started_at',
+                              'vocabulary_finished_at', 'reading_started_at', 'reading_finished_at'],
+                session_rows, batch_size,
+            )
+            stats['answers'] += insert_rows(
+                UserAnswer, ['applicant', 'test_session', 'question', 'selected_option', 'is_correct', 'answered_at'],
+                answer_rows, batch_size,
+            )
+            stats['results'] += insert_rows(
+                TestResult, ['applicant', 'level', 'correct_answers', 'total_questions', 'created_at', 'updated_at'],
+                result_rows, batch_size,
+            )
+            reset_sequences(TestSession, UserAnswer, TestResult)
+        if progress:
+            progress(stats)
+
+    return created
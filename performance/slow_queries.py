@@ -0,0 +1,98 @@
+import hashlib
+import json
+import logging
+import re
+import time
+
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+logger = logging.getLogger('performance.slow_queries')
+
+# Statements worth explaining; BEGIN/SAVEPOINT/PRAGMA etc. are skipped
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+# Сколько параметров сохранять для bulk-запросов
+MAX_PARAMS = 50
+
+_placeholder_lists = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_whitespace = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Normalize SQL so that queries differing only in IN-list length group together.
+
+    Django SQL already uses ``%s`` placeholders, so only whitespace and
+    ``IN (%s, %s, ...)`` lists need folding.
+
+    Returns:
+        tuple: (fingerprint_hash, normalized_sql)
+    """
+    normalized = _whitespace.sub(' ', _placeholder_lists.sub('(...)', sql)).strip()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12], normalized
+
+
+def explain(sql, params):
+    """Return the query plan as a list of lines, or the error text.
+
+    Runs on a bare backend cursor: it bypasses every ``execute_wrapper``, so
+    the EXPLAIN neither recurses into this logger nor shows up in query counts.
+    """
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        rows = cursor.fetchall()
+    except DatabaseError as e:
+        return [f'EXPLAIN failed: {e}']
+    finally:
+        cursor.close()
+    # SQLite: (id, parent, notused, detail); other backends: one text column
+    return [row[-1] for row in rows]
+
+
+class SlowQueryLogger:
+    """``execute_wrapper`` that logs every query slower than ``threshold_ms``.
+
+    One JSON line per query: SQL, parameters, the view that issued it and the
+    ``EXPLAIN QUERY PLAN`` output.
+    """
+
+    def __init__(self, threshold_ms, request=None):
+        self.threshold_ms = threshold_ms
+        self.request = request
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if duration_ms >= self.threshold_ms:
+                self.log(sql, params, many, duration_ms)
+
+    def log(self, sql, params, many, duration_ms):
+        params = list(params or [])
+        explain_params = params[0] if many and params else params
+        query_hash, normalized = fingerprint(sql)
+
+        record = {
+            'ts': timezone.now().isoformat(),
+            'duration_ms': round(duration_ms, 3),
+            'threshold_ms': self.threshold_ms,
+            'fingerprint': query_hash,
+            'normalized_sql': normalized,
+            'sql': sql,
+            'params': params[:MAX_PARAMS],
+            'many': many,
+            'view': None,
+            'method': None,
+            'path': None,
+            'plan': explain(sql, explain_params) if sql.lstrip().upper().startswith(EXPLAINABLE) else [],
+        }
+        if self.request is not None:
+            match = self.request.resolver_match
+            record.update({
+                'view': match.view_name or match._func_path if match else None,
+                'method': self.request.method,
+                'path': self.request.path,
+            })
+        logger.info(json.dumps(record, default=str, ensure_ascii=False))
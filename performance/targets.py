@@ -0,0 +1,112 @@
+"""Request targets shared by the load-test and replay commands"""
+import json
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+# Количество запросов из заголовка Server-Timing (PerformanceMiddleware)
+SERVER_TIMING_QUERIES = re.compile(r'db;desc="(\d+) queries"')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def encode_body(body):
+    """Raw bodies are sent as they are, anything else as JSON"""
+    if isinstance(body, bytes):
+        return body
+    if isinstance(body, str):
+        return body.encode()
+    return json.dumps(body if body is not None else {}).encode()
+
+
+class InProcessTarget:
+    """Drives the WSGI app in this process; counts SQL queries per request"""
+
+    name = 'in-process'
+
+    def __init__(self):
+        self._local = threading.local()
+        # Lets the test client's 'testserver' host through ALLOWED_HOSTS
+        setup_test_environment()
+
+    def request(self, method, path, params=None, body=None, content_type='application/json'):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client(raise_request_exception=False)
+
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        if params:
+            path = f'{path}?{urllib.parse.urlencode(params)}'
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            if method == 'GET':
+                response = client.get(path)
+            else:
+                response = client.generic(method, path, data=encode_body(body), content_type=content_type)
+        elapsed = time.perf_counter() - started
+
+        locked = bool(response.exc_info and 'database is locked' in str(response.exc_info[1]))
+        data = response.json() if response.get('Content-Type', '').startswith('application/json') else None
+        return response.status_code, data, elapsed, queries, locked
+
+    def finish_thread(self):
+        connection.close()
+
+
+class HttpTarget:
+    """Drives a running server over HTTP.
+
+    SQL query counts come from the Server-Timing header, which the server sends
+    only with SERVER_TIMING=1; without it they are reported as unknown.
+    """
+
+    def __init__(self, base_url):
+        self.name = base_url
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, params=None, body=None, content_type='application/json'):
+        url = self.base_url + path
+        if params:
+            url = f'{url}?{urllib.parse.urlencode(params)}'
+        data = encode_body(body) if method != 'GET' else None
+        req = urllib.request.Request(url, data=data, method=method, headers={'Content-Type': content_type})
+
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                status, payload, headers = response.status, response.read(), response.headers
+        except urllib.error.HTTPError as e:
+            status, payload, headers = e.code, e.read(), e.headers
+        elapsed = time.perf_counter() - started
+
+        match = SERVER_TIMING_QUERIES.search(headers.get('Server-Timing', ''))
+        queries = int(match.group(1)) if match else None
+        locked = status >= 500 and b'database is locked' in payload
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            data = None
+        return status, data, elapsed, queries, locked
+
+    def finish_thread(self):
+        pass
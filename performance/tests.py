@@ -0,0 +1,270 @@
+import json
+import math
+from collections import Counter
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, resolve, reverse
+
+from performance.seeding import seed_cohort, seed_question_bank
+from performance.slow_queries import fingerprint
+from questions.cache import bump_bank_version
+from questions.models import Question
+from questions.views import EXPORT_CHUNK_SIZE
+from tests.models import TestResult
+from tests.services import TestFormService
+
+# Абитуриенты, которых тест проводит через API сам
+REGISTER_IIN = '100000000001'
+FLOW_IIN = '100000000002'
+
+# Размер данных на единицу масштаба
+QUESTIONS_PER_POOL = 30
+APPLICANTS = 20
+SCALES = (1, 10)
+
+# Budgets leave room for a couple of incidental queries. Endpoints whose query
+# count is part of their design (cache hits, compare-and-set, single-query batch
+# reads, static responses) keep an exact budget. Growth with the amount of data
+# is checked separately and exactly: that is what catches an N+1.
+
+
+class Case:
+    """One measured request: the route it covers and its SQL query budget.
+
+    ``params`` and ``body`` may be callables taking the run context (earlier
+    responses, seeded IDs); ``budget`` may be one as well.
+    """
+
+    def __init__(self, name, method, path, budget, params=None, body=None, admin_client=False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.budget = budget
+        self.params = params
+        self.body = body
+        self.admin_client = admin_client
+
+    def resolve(self, value, context):
+        return value(context) if callable(value) else value
+
+
+def api_cases():
+    """Every non-admin route, in the order an applicant would hit them"""
+    return [
+        Case('register', 'POST', '/users/register/', 5,
+             body={'iin': REGISTER_IIN, 'first_name': 'Budget', 'last_name': 'Check'}),
+        Case('personalized', 'GET', '/tests/personalized/', 8, params={'iin': FLOW_IIN}),
+        Case('questions-by-stage', 'GET', '/tests/questions-by-stage/', 8,
+             params={'iin': FLOW_IIN, 'stage_type': 'Grammar'}),
+        # questions-by-stage has just written the session state through to the cache
+        Case('session-status', 'GET', '/tests/session-status/', 0, params={'iin': FLOW_IIN}),
+        Case('session-status-batch', 'POST', '/tests/session-status-batch/', 1,
+             body=lambda context: context['cohort'] + [FLOW_IIN]),
+        Case('submit', 'POST', '/tests/submit/', 12, body=lambda context: {
+            'iin': FLOW_IIN,
+            'level': context['questions-by-stage']['level'],
+            'answers': [
+                {'question_id': question['id'], 'selected_option': question['options'][0]['id']}
+                for question in context['questions-by-stage']['questions']
+            ],
+        }),
+        # The cached session leaves only the compare-and-set UPDATE
+        Case('finish-stage', 'POST', lambda context: (
+            f'/tests/finish-stage/?iin={FLOW_IIN}&stage_type=Grammar&level={context["questions-by-stage"]["level"]}'
+        ), 1),
+        Case('user-answers', 'GET', '/tests/user-answers/', 4, params=lambda context: {'iin': context['answered_iin']}),
+        Case('results', 'GET', '/tests/results/', 4, params=lambda context: {'iin': context['answered_iin']}),
+        Case('results-batch', 'POST', '/tests/results-batch/', 1, body=lambda context: context['cohort']),
+        Case('questions-list', 'GET', '/questions/list/', 4, params={'type': 'Grammar'}),
+        Case('questions-list-page', 'GET', '/questions/list/', 4, params={'limit': 50}),
+        # Export streams the whole bank: one query plus one options prefetch per chunk
+        Case('questions-export', 'GET', '/questions/export/', lambda context: 2 + context['export_chunks']),
+        Case('metrics', 'GET', '/metrics', 0),
+        Case('schema', 'GET', '/schema/', 0),
+        Case('swagger-ui', 'GET', '/schema/swagger-ui/', 0),
+        Case('redoc', 'GET', '/schema/redoc/', 0),
+    ]
+
+
+# Changelist and change page of every registered model; session + user lookups included.
+# Change pages look up one label per raw_id_fields foreign key.
+ADMIN_INDEX_BUDGET = 5
+ADMIN_CHANGELIST_BUDGET = 7
+ADMIN_CHANGE_BUDGET = 11
+
+# Выгрузка читает банк по частям: число запросов растёт с объёмом данных намеренно
+GROWS_WITH_DATA = {'questions-export'}
+
+
+def admin_cases():
+    cases = [Case('admin:index', 'GET', reverse('admin:index'), ADMIN_INDEX_BUDGET, admin_client=True)]
+    for model in sorted(admin.site._registry, key=lambda model: model._meta.label):
+        opts = model._meta
+        url_name = f'admin:{opts.app_label}_{opts.model_name}'
+        cases.append(Case(
+            f'admin:{opts.label_lower}:changelist', 'GET', reverse(f'{url_name}_changelist'),
+            ADMIN_CHANGELIST_BUDGET, admin_client=True,
+        ))
+        cases.append(Case(
+            f'admin:{opts.label_lower}:change', 'GET',
+            lambda context, model=model, url_name=url_name: reverse(
+                f'{url_name}_change', args=[context['admin_objects'][model]]
+            ),
+            ADMIN_CHANGE_BUDGET, admin_client=True,
+        ))
+    return cases
+
+
+def all_routes(resolver=None, prefix=''):
+    """Full route strings of every URL pattern"""
+    routes = []
+    for pattern in (resolver or get_resolver()).url_patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            routes.extend(all_routes(pattern, route))
+        elif isinstance(pattern, URLPattern):
+            routes.append(route)
+    return routes
+
+
+def wait_for_background_work():
+    # Формирование вариантов тестов идёт в фоне; ждём его, чтобы замеры не пересекались
+    TestFormService._executor.submit(int).result()
+
+
+# Process-local cache: the test must not clear or fill the shared cache of a running server.
+# /metrics is opt-in; the test client connects from 127.0.0.1.
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    METRICS_ENABLED=True,
+    METRICS_ALLOWED_IPS=['127.0.0.1'],
+)
+class QueryBudgetTests(TransactionTestCase):
+    """Every route within its SQL query budget, and no query count growing with the data.
+
+    TransactionTestCase: test forms are built on a background thread with its
+    own connection, which must see the committed seed data.
+    """
+
+    def test_query_budgets(self):
+        counts = {scale: self.run_scale(scale) for scale in SCALES}
+
+        # Admin add/delete/history pages are not measured
+        covered = {result['route'] for result in counts[SCALES[-1]].values()}
+        uncovered = [route for route in all_routes() if route not in covered and not route.startswith('admin/')]
+        self.assertEqual(uncovered, [], 'routes without a query-budget case')
+
+        for scale, results in counts.items():
+            for name, result in results.items():
+                with self.subTest(case=name, scale=scale):
+                    self.assertLess(result['status'], 400, result['content'])
+                    self.assertLessEqual(
+                        result['queries'], result['budget'],
+                        f'{name} ran {result["queries"]} queries, budget {result["budget"]}'
+                        + ''.join(f'\n  repeated x{count}: {sql[:160]}' for sql, count in result['repeated']),
+                    )
+
+        smallest, largest = SCALES[0], SCALES[-1]
+        for name, result in counts[largest].items():
+            if name in GROWS_WITH_DATA:
+                continue
+            with self.subTest(case=name, growth=f'{smallest}->{largest}'):
+                self.assertEqual(
+                    result['queries'], counts[smallest][name]['queries'],
+                    f'{name}: query count grows with the amount of data (N+1?)',
+                )
+
+    def run_scale(self, scale):
+        call_command('flush', interactive=False, verbosity=0)
+        # Cached session states would outlive the flushed rows
+        cache.clear()
+        seed_question_bank(QUESTIONS_PER_POOL * scale)
+        cohort = seed_cohort(APPLICANTS * scale)
+
+        api = Client()
+        api.post('/users/register/', data={'iin': FLOW_IIN, 'first_name': 'Budget', 'last_name': 'Flow'},
+                 content_type='application/json')
+        wait_for_background_work()
+
+        superuser = get_user_model().objects.create_superuser('budget', 'budget@example.com', 'budget')
+        Group.objects.create(name='Budget reviewers')
+        staff = Client()
+        staff.force_login(superuser)
+
+        context = {
+            'cohort': cohort,
+            'answered_iin': TestResult.objects.order_by('id').values_list('applicant_id', flat=True).first(),
+            'export_chunks': math.ceil(Question.objects.count() / EXPORT_CHUNK_SIZE),
+        }
+        results = {}
+        for case in api_cases() + admin_cases():
+            if case.admin_client and 'admin_objects' not in context:
+                context['admin_objects'] = {
+                    model: model._default_manager.order_by('pk').values_list('pk', flat=True).first()
+                    for model in admin.site._registry
+                }
+            results[case.name] = self.run_case(case, staff if case.admin_client else api, context)
+        return results
+
+    def run_case(self, case, client, context):
+        path = case.resolve(case.path, context)
+        params = case.resolve(case.params, context)
+        body = case.resolve(case.body, context)
+
+        # Every case starts with cold question-bank caches
+        bump_bank_version()
+        with CaptureQueriesContext(connection) as queries:
+            if case.method == 'GET':
+                response = client.get(path, params)
+            else:
+                response = client.post(path, data=json.dumps(body or {}), content_type='application/json')
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+        wait_for_background_work()
+
+        if response.get('Content-Type', '').startswith('application/json') and not response.streaming:
+            context[case.name] = response.json()
+
+        repeated = Counter(fingerprint(query['sql'])[1] for query in queries.captured_queries)
+        return {
+            'queries': len(queries),
+            'budget': case.resolve(case.budget, context),
+            'status': response.status_code,
+            'route': resolve(path.split('?')[0]).route,
+            'content': content[:200],
+            'repeated': [(sql, count) for sql, count in repeated.most_common() if count > 1],
+        }
+
+
+class InstrumentationTests(TestCase):
+    """Timings and route names are exposed only when switched on"""
+
+    def test_off_by_default(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get('/metrics')
+        self.assertRegex(response['Server-Timing'], r'db;desc="\d+ queries"')
+
+    @override_settings(METRICS_ENABLED=True, METRICS_ALLOWED_IPS=['10.0.0.0/8'])
+    def test_metrics_access(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, 200)
+
+        user = get_user_model().objects.create_user('viewer', password='viewer')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        user.is_staff = True
+        user.save()
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
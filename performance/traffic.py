@@ -0,0 +1,52 @@
+import json
+import os
+from urllib.parse import parse_qs
+
+# Тела больше этого размера сохраняются только как хэш
+MAX_RECORDED_BODY = 256 * 1024
+
+
+class TrafficLog:
+    """Append-only JSON-lines file.
+
+    Each record is written with a single ``write`` on an ``O_APPEND``
+    descriptor, so several workers can share one file without interleaving
+    lines.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o640)
+
+    def append(self, record):
+        os.write(self.fd, (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8'))
+
+
+def applicant_key(query_string, body, content_type):
+    """IIN a request belongs to, from the query string or a JSON body; None if there is none"""
+    iin = parse_qs(query_string).get('iin')
+    if iin:
+        return iin[0]
+    if body and content_type == 'application/json' and len(body) <= MAX_RECORDED_BODY:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        if isinstance(data, dict) and isinstance(data.get('iin'), str):
+            return data['iin']
+    return None
+
+
+def read_traffic(path):
+    """Records of a traffic log ordered by start time; unreadable lines are skipped"""
+    records = []
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    records.sort(key=lambda record: record['ts'])
+    return records
@@ -0,0 +1,28 @@
+import ipaddress
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+from .metrics import registry
+
+
+def is_allowed_ip(address):
+    """REMOTE_ADDR matches one of METRICS_ALLOWED_IPS (addresses or networks)"""
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(allowed, strict=False) for allowed in settings.METRICS_ALLOWED_IPS)
+
+
+def metrics(request):
+    """Request histograms of this worker in Prometheus text format.
+
+    Off unless METRICS_ENABLED; then open to allowlisted IPs and staff users.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    # The IP check first: a scraper from the allowlist costs no session lookup
+    if not (is_allowed_ip(request.META.get('REMOTE_ADDR', '')) or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
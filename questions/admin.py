@@ -15,5 +15,7 @@ class QuestionAdmin(admin.ModelAdmin):
 @admin.register(Option)
 class OptionAdmin(admin.ModelAdmin):
     list_display = ('id', 'question', 'label', 'text', 'is_correct')
+    list_select_related = ('question',)
+    raw_id_fields = ('question',)
     list_filter = ('is_correct',)
     search_fields = ('text',)
\ No newline at end of file
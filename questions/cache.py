@@ -0,0 +1,161 @@
+import threading
+import time
+from array import array
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Question
+from .serializers import QuestionSerializer
+
+# Ключ счётчика версии банка вопросов в общем кэше Django
+BANK_VERSION_KEY = 'questions:bank_version'
+
+# Индексы уровня воркера: (level, type) -> (version, sorted array of ids)
+_id_index = {}
+# Сериализованные вопросы уровня воркера: id -> payload, для одной версии банка
+_payloads = {'version': None, 'items': {}}
+# Ключи ответов уровня воркера: level -> (version, AnswerKey)
+_answer_keys = {}
+_lock = threading.Lock()
+
+
+def get_bank_version():
+    """Return the current question-bank version.
+
+    The counter lives in the shared Django cache (see ``CACHES``), so a bump
+    from any process (an import, an admin edit in another worker) reaches every
+    worker. If the key is missing (first start, eviction) it is re-seeded from
+    the clock so stale entries are never reused.
+    """
+    version = cache.get(BANK_VERSION_KEY)
+    if version is None:
+        cache.add(BANK_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(BANK_VERSION_KEY)
+    return version
+
+
+def bump_bank_version():
+    """Invalidate every cached index and payload after the question bank changed."""
+    try:
+        cache.incr(BANK_VERSION_KEY)
+    except ValueError:
+        cache.set(BANK_VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def bump_bank_version_on_commit(using=None):
+    """Bump the version once the current transaction commits.
+
+    Bumping earlier would let another worker rebuild its cache from the
+    not-yet-committed state and keep it under the new version.
+
+    A transaction queues at most one bump however many rows it touches (an
+    import or a cascading delete fires a signal per row, and every bump is a
+    write to the shared cache). The queued callback is remembered on the
+    connection until it runs; if a rollback has dropped it from the on-commit
+    queue, the next change queues a new one.
+    """
+    connection = transaction.get_connection(using)
+    queued = getattr(connection, '_bank_version_bump', None)
+    if queued is not None and connection.in_atomic_block and any(
+        func is queued for _, func, _ in connection.run_on_commit
+    ):
+        return
+
+    def bump():
+        connection._bank_version_bump = None
+        bump_bank_version()
+
+    connection._bank_version_bump = bump
+    transaction.on_commit(bump, using=using)
+
+
+def get_question_ids(level, question_type):
+    """Return the sorted IDs of a (level, type) pool as a compact array.
+
+    Built once per worker and bank version from a single ``values_list`` query.
+    """
+    key = (level, question_type)
+    version = get_bank_version()
+    cached = _id_index.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    with _lock:
+        cached = _id_index.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+        ids = array('q', Question.objects.filter(type=question_type, level=level, is_active=True)
+                    .order_by('id').values_list('id', flat=True))
+        _id_index[key] = (version, ids)
+        return ids
+
+
+def get_question_payloads(question_ids):
+    """Return serialized questions (with options) in the order of ``question_ids``.
+
+    Payloads already served under the current bank version are reused; the
+    rest are loaded with one prefetched query, so a warm worker serves a stage
+    without touching the question bank.
+    """
+    version = get_bank_version()
+    with _lock:
+        if _payloads['version'] != version:
+            _payloads['version'] = version
+            _payloads['items'] = {}
+        items = _payloads['items']
+        missing = [qid for qid in question_ids if qid not in items]
+
+    if missing:
+        questions = Question.objects.filter(id__in=missing).prefetch_related('options')
+        loaded = {payload['id']: payload for payload in QuestionSerializer(questions, many=True).data}
+        with _lock:
+            if _payloads['version'] == version:
+                _payloads['items'].update(loaded)
+        items = {**items, **loaded}
+
+    return [items[qid] for qid in question_ids if qid in items]
+
+
+class AnswerKey:
+    """Answer key of one level: which questions exist and which options are correct.
+
+    ``options`` maps option_id to ``(question_id, is_correct)``;
+    ``question_ids`` is the set of valid question IDs of the level.
+    """
+
+    def __init__(self, options, question_ids):
+        self.options = options
+        self.question_ids = question_ids
+
+    def grade(self, question_id, option_id):
+        """Return ``(is_valid_question, option_id_or_None, is_correct)`` for one answer"""
+        if question_id not in self.question_ids:
+            return False, None, False
+        entry = self.options.get(option_id)
+        if entry is None or entry[0] != question_id:
+            return True, None, False
+        return True, option_id, entry[1]
+
+
+def get_answer_key(level):
+    """Return the ``AnswerKey`` of a level, cached per worker and bank version.
+
+    A cache miss costs one query (questions left-joined with their options).
+    """
+    version = get_bank_version()
+    cached = _answer_keys.get(level)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    options = {}
+    question_ids = set()
+    rows = Question.objects.filter(level=level).values_list('id', 'options__id', 'options__is_correct')
+    for question_id, option_id, is_correct in rows:
+        question_ids.add(question_id)
+        if option_id is not None:
+            options[option_id] = (question_id, is_correct)
+
+    answer_key = AnswerKey(options, frozenset(question_ids))
+    _answer_keys[level] = (version, answer_key)
+    return answer_key
@@ -0,0 +1,25 @@
+import hashlib
+
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+from .cache import get_bank_version
+
+
+def make_etag(*parts):
+    """Strong ETag for a payload derived from the bank version and the given parts"""
+    raw = '|'.join(str(part) for part in (get_bank_version(),) + parts)
+    return '"%s"' % hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def etag_matches(request, etag):
+    """Whether the request's If-None-Match already names ``etag``"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
+
+
+def not_modified(etag):
+    return Response(status=304, headers={'ETag': etag})
@@ -1,8 +1,12 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from questions.models import Question
+from questions.validation import DEFECTS, validate_bank, fix_defects
+
+# Что удаляется по умолчанию (прежнее поведение команды)
+DEFAULT_DEFECTS = ['no_options', 'no_correct_option']
 
 class Command(BaseCommand):
-    help = 'Delete questions that have no options or no correct options'
+    help = 'Validate the question bank and delete questions that have defects (by default: no options or no correct options)'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -10,66 +14,78 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be deleted without actually deleting',
         )
+        parser.add_argument(
+            '--defects',
+            type=str,
+            default=','.join(DEFAULT_DEFECTS),
+            help=f'Comma-separated defect classes to fix: {", ".join(DEFECTS)}',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Fix every defect class',
+        )
+        parser.add_argument(
+            '--retire',
+            action='store_true',
+            help='Retire defective questions (is_active=False) instead of deleting them',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
-        
-        # Get all questions
-        all_questions = Question.objects.all()
-        total_questions = all_questions.count()
-        
-        # Find questions with no options
-        questions_without_options = []
-        questions_without_correct_options = []
-        
-        for question in all_questions:
-            options = question.options.all()
-            
-            if not options.exists():
-                questions_without_options.append(question)
-            else:
-                # Check if any option is marked as correct
-                has_correct_option = options.filter(is_correct=True).exists()
-                if not has_correct_option:
-                    questions_without_correct_options.append(question)
-        
-        # Combine both lists (remove duplicates)
-        invalid_questions = list(set(questions_without_options + questions_without_correct_options))
-        
+        codes = list(DEFECTS) if options['all'] else [code.strip() for code in options['defects'].split(',') if code.strip()]
+        unknown = [code for code in codes if code not in DEFECTS]
+        if unknown:
+            raise CommandError(f'Unknown defect classes: {", ".join(unknown)}')
+
+        total_questions = Question.objects.count()
+        report = validate_bank()
+
+        self.write_report(report, codes)
+
+        invalid_questions = report.question_ids([code for code in codes if code != 'empty_option_text'])
+        empty_options = report.option_ids(codes)
+
         if dry_run:
             self.stdout.write(
-                self.style.WARNING(f'DRY RUN - Would delete {len(invalid_questions)} questions:')
+                self.style.WARNING(
+                    f'\nDRY RUN - Would {"retire" if options["retire"] else "delete"} {len(invalid_questions)} questions '
+                    f'and delete {len(empty_options)} empty options'
+                )
             )
-            
-            if questions_without_options:
-                self.stdout.write(f'\nQuestions with no options ({len(questions_without_options)}):')
-                for q in questions_without_options:
-                    self.stdout.write(f'  - ID {q.id}: {q.type} ({q.level}) - {q.prompt[:50]}...')
-            
-            if questions_without_correct_options:
-                self.stdout.write(f'\nQuestions with no correct options ({len(questions_without_correct_options)}):')
-                for q in questions_without_correct_options:
-                    self.stdout.write(f'  - ID {q.id}: {q.type} ({q.level}) - {q.prompt[:50]}...')
-            
-            self.stdout.write(f'\nTotal questions in database: {total_questions}')
-            self.stdout.write(f'Questions to be deleted: {len(invalid_questions)}')
+            self.stdout.write(f'Total questions in database: {total_questions}')
             self.stdout.write(f'Questions that would remain: {total_questions - len(invalid_questions)}')
-            
-        else:
-            # Actually delete the questions
-            if invalid_questions:
-                question_ids = [q.id for q in invalid_questions]
-                deleted_count = Question.objects.filter(id__in=question_ids).delete()[0]
-                
-                self.stdout.write(
-                    self.style.SUCCESS(f'Successfully deleted {deleted_count} invalid questions!')
-                )
-                
-                if questions_without_options:
-                    self.stdout.write(f'  - {len(questions_without_options)} questions had no options')
-                if questions_without_correct_options:
-                    self.stdout.write(f'  - {len(questions_without_correct_options)} questions had no correct options')
-            else:
-                self.stdout.write(
-                    self.style.SUCCESS('No invalid questions found. All questions are valid!')
-                ) 
\ No newline at end of file
+            return
+
+        if not invalid_questions and not empty_options:
+            self.stdout.write(
+                self.style.SUCCESS('No invalid questions found. All questions are valid!')
+            )
+            return
+
+        questions_fixed, options_deleted = fix_defects(report, codes, retire=options['retire'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully {"retired" if options["retire"] else "deleted"} {questions_fixed} invalid questions '
+                f'and deleted {options_deleted} empty options!'
+            )
+        )
+
+    def write_report(self, report, codes):
+        """Defects grouped by level and type, then the affected questions"""
+        groups = report.by_level_and_type()
+        if not groups:
+            return
+
+        self.stdout.write('Defects by level and type:')
+        for (level, question_type), counts in groups.items():
+            summary = ', '.join(f'{code}={count}' for code, count in counts.items())
+            self.stdout.write(f'  {level} {question_type}: {summary}')
+
+        for code in codes:
+            rows = report.defects[code]
+            if not rows:
+                continue
+            self.stdout.write(f'\n{DEFECTS[code]} ({len(rows)}):')
+            for row in rows:
+                self.stdout.write(f'  - ID {row["question_id"]}: {row["type"]} ({row["level"]}) - {row["prompt"][:50]}...')
@@ -1,8 +1,12 @@
 import json
 import os
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from questions.models import Question, Option, QuestionType
+from questions.utils import (
+    JSONStreamError, import_questions_from_json_stream, level_from_filename, parse_question_record,
+    question_content_hash, sync_question_records,
+)
 from users.models import EnglishLevel
 
 
@@ -20,6 +24,27 @@ class Command(BaseCommand):
             action='store_true',
             help='Clear existing questions before importing'
         )
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help='Only insert new, update changed and retire removed questions (by content hash)'
+        )
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            help='Parse the file incrementally and commit it in batches (bounded memory)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of questions per committed batch in --stream mode'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='In --stream mode, continue after the last committed batch of an interrupted import'
+        )
         parser.add_argument(
             '--level',
             type=str,
@@ -31,6 +56,13 @@ class Command(BaseCommand):
         json_path = options['json_path']
         clear_existing = options['clear']
         override_level = options['level']
+        self.sync = options['sync']
+        self.stream = options['stream']
+        self.batch_size = options['batch_size']
+        self.resume = options['resume']
+
+        if self.sync and self.stream:
+            raise CommandError('--sync and --stream cannot be combined: a sync needs the whole file to find removed questions')
 
         if os.path.isfile(json_path):
             self.import_from_file(json_path, clear_existing, override_level)
@@ -58,6 +90,10 @@ class Command(BaseCommand):
 
     def import_from_file(self, file_path, clear_existing, override_level):
         """Import questions from a single JSON file"""
+        if self.stream:
+            self.stream_file(file_path, clear_existing, override_level)
+            return
+
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
                 data = json.load(file)
@@ -82,6 +118,10 @@ class Command(BaseCommand):
                 else:
                     override_level = 'A1'  # Default
 
+            if self.sync:
+                self.sync_file(file_path, data, override_level)
+                return
+
             with transaction.atomic():
                 if clear_existing:
                     Question.objects.filter(level=override_level).delete()
@@ -109,6 +149,52 @@ class Command(BaseCommand):
                 self.style.ERROR(f'Error processing {file_path}: {e}')
             )
 
+    def stream_file(self, file_path, clear_existing, override_level):
+        """Bounded-memory import: one element at a time, committed in batches"""
+        level = override_level or level_from_filename(file_path)
+        try:
+            imported_count = import_questions_from_json_stream(
+                file_path,
+                level=level,
+                clear_existing=clear_existing,
+                batch_size=self.batch_size,
+                resume=self.resume,
+            )
+        except (JSONStreamError, json.JSONDecodeError) as e:
+            # Re-reading the same file would fail at the same place: it has to be fixed first
+            self.stdout.write(
+                self.style.ERROR(f'Invalid JSON in {file_path}: {e}. Batches before the error are committed; fix the file and re-import it with --clear')
+            )
+            return
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Error importing {file_path}: {e}. Re-run with --resume to continue after the last committed batch')
+            )
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully imported {imported_count} questions from {file_path}'
+            )
+        )
+
+    def sync_file(self, file_path, data, level):
+        """Diff-based import: only changed questions are written"""
+        records = [parse_question_record(question_data, level) for question_data in data]
+        valid = [record for record in records if record is not None]
+        if len(valid) < len(records):
+            self.stdout.write(
+                self.style.WARNING(f'Skipping {len(records) - len(valid)} invalid questions')
+            )
+
+        stats = sync_question_records(valid)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Synced {file_path}: {stats["inserted"]} inserted, {stats["updated"]} updated, '
+                f'{stats["unchanged"]} unchanged, {stats["retired"]} retired'
+            )
+        )
+
     def create_question(self, question_data, level):
         """Create a single question from JSON data"""
         try:
@@ -149,7 +235,8 @@ class Command(BaseCommand):
                 type=type_mapping[question_type],
                 level=level,
                 prompt=prompt,
-                paragraph=paragraph if paragraph else None
+                paragraph=paragraph if paragraph else None,
+                content_hash=question_content_hash(parse_question_record(question_data, level))
             )
 
             # Create options
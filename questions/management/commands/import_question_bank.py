@@ -0,0 +1,129 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from questions.models import Question
+from questions.utils import parse_excel_file, parse_json_file, save_question_records
+
+
+def parse_source(file_path):
+    """Parse one file into plain records (runs in a worker process)"""
+    started = time.perf_counter()
+    if file_path.endswith('.xlsx'):
+        records, skipped = parse_excel_file(file_path), 0
+    else:
+        records, skipped = parse_json_file(file_path)
+    return file_path, records, skipped, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = 'Import the whole question bank: parse JSON/Excel files in parallel, write them from a single process'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='+',
+            type=str,
+            help='JSON/XLSX files or directories (e.g. data/json data/KELET-B1.xlsx)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of parser processes (default: number of CPUs)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of questions committed per write batch'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Replace the questions of every imported level: all files are parsed first, '
+                 'then cleared and written in one transaction'
+        )
+
+    def handle(self, *args, **options):
+        files = self.collect_files(options['paths'])
+        if not files:
+            raise CommandError('No .json or .xlsx files found')
+
+        batch_size = options['batch_size']
+        self.clear_existing = options['clear']
+        self.cleared_levels = set()
+        self.write_time = 0.0
+        self.imported_count = 0
+
+        started = time.perf_counter()
+        parse_time = 0.0
+        skipped_count = 0
+        pending = []
+        failed = []
+
+        # Parsers run in a process pool; this process is the only DB writer
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as executor:
+            futures = {executor.submit(parse_source, file_path): file_path for file_path in files}
+            for future in as_completed(futures):
+                try:
+                    file_path, records, skipped, elapsed = future.result()
+                except Exception as e:
+                    failed.append(futures[future])
+                    self.stdout.write(self.style.ERROR(f'Failed to parse {futures[future]}: {e}'))
+                    continue
+                parse_time += elapsed
+                skipped_count += skipped
+                self.stdout.write(f'Parsed {len(records)} questions from {file_path} in {elapsed:.2f}s')
+
+                pending.extend(records)
+                # With --clear nothing is written until every file has parsed
+                if not self.clear_existing and len(pending) >= batch_size:
+                    self.flush(pending, batch_size)
+                    pending = []
+
+        if failed and self.clear_existing:
+            raise CommandError(
+                f'{len(failed)} of {len(files)} files failed to parse; nothing was cleared or imported'
+            )
+        if pending:
+            self.flush(pending, batch_size)
+
+        total_time = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.imported_count} questions from {len(files) - len(failed)} files '
+            f'({skipped_count} invalid skipped)'
+        ))
+        self.stdout.write(f'  parse (sum over workers): {parse_time:.2f}s')
+        self.stdout.write(f'  write:                    {self.write_time:.2f}s')
+        self.stdout.write(f'  total wall time:          {total_time:.2f}s')
+        if failed:
+            raise CommandError(f'{len(failed)} of {len(files)} files failed to parse and were skipped: {", ".join(failed)}')
+
+    def collect_files(self, paths):
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(sorted(glob.glob(os.path.join(path, '*.json'))))
+                files.extend(sorted(glob.glob(os.path.join(path, '*.xlsx'))))
+            elif os.path.isfile(path):
+                files.append(path)
+            else:
+                raise CommandError(f'Path does not exist: {path}')
+        return files
+
+    def flush(self, records, batch_size):
+        """Write records in one transaction; with --clear this is the whole run, clear included"""
+        started = time.perf_counter()
+        with transaction.atomic():
+            if self.clear_existing:
+                for level in sorted({record['level'] for record in records} - self.cleared_levels):
+                    Question.objects.filter(level=level).delete()
+                    self.cleared_levels.add(level)
+                    self.stdout.write(self.style.WARNING(f'Cleared existing {level} questions'))
+            self.imported_count += save_question_records(records, batch_size=batch_size)
+        self.write_time += time.perf_counter() - started
@@ -9,5 +9,5 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         excel_path = options['excel_path']
-        import_questions_from_excel(excel_path)
-        self.stdout.write(self.style.SUCCESS(f'Вопросы успешно импортированы из {excel_path}')) 
\ No newline at end of file
+        imported_count = import_questions_from_excel(excel_path)
+        self.stdout.write(self.style.SUCCESS(f'Вопросы успешно импортированы из {excel_path}: {imported_count}')) 
\ No newline at end of file
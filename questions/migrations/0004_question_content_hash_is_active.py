@@ -0,0 +1,48 @@
+# Generated by Django 5.2.3 on 2026-10-17 03:31
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def fill_content_hashes(apps, schema_editor):
+    # Frozen copy of questions.utils.question_content_hash
+    Question = apps.get_model('questions', 'Question')
+    Option = apps.get_model('questions', 'Option')
+
+    options_by_question = {}
+    for question_id, label, text, is_correct in Option.objects.values_list('question_id', 'label', 'text', 'is_correct'):
+        options_by_question.setdefault(question_id, []).append((label, text, bool(is_correct)))
+
+    questions = list(Question.objects.only('id', 'type', 'level', 'prompt', 'paragraph'))
+    for question in questions:
+        payload = json.dumps(
+            [question.type, question.level, question.prompt, question.paragraph or '',
+             sorted(options_by_question.get(question.id, []))],
+            ensure_ascii=False,
+            separators=(',', ':'),
+        )
+        question.content_hash = hashlib.sha256(payload.encode()).hexdigest()
+    Question.objects.bulk_update(questions, ['content_hash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0003_alter_question_level'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(fill_content_hashes, migrations.RunPython.noop),
+    ]
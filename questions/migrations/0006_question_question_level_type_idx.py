@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-17 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0005_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['level', 'type'], name='question_level_type_idx'),
+        ),
+    ]
@@ -12,11 +12,21 @@ class Question(models.Model):
     level = models.CharField(max_length=2, choices=EnglishLevel.choices)
     prompt = models.TextField()  # Main question
     paragraph = models.TextField(blank=True, null=True)  # For Reading type
+    # sha256 of type, level, prompt, paragraph and options; maintained by the importers
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    # Retired questions are kept for answer history but are no longer served
+    is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.type} ({self.level}): {self.prompt[:30]}..."
 
+    class Meta:
+        indexes = [
+            # ID pools of active questions per (level, type), already in id order
+            models.Index(fields=['level', 'type'], condition=models.Q(is_active=True), name='question_level_type_idx'),
+        ]
+
 class Option(models.Model):
     question = models.ForeignKey(Question, related_name='options', on_delete=models.CASCADE)
     label = models.CharField(max_length=1)  # A, B, C, D, etc.
@@ -25,3 +35,13 @@ class Option(models.Model):
 
     def __str__(self):
         return f"{self.label}. {self.text}"
+
+class ImportCheckpoint(models.Model):
+    """Progress of a batched streaming import, committed together with each batch"""
+    source = models.CharField(max_length=500, unique=True)  # Absolute path of the imported file
+    fingerprint = models.CharField(max_length=100)  # Size and mtime of the file when the import started
+    records_committed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source}: {self.records_committed} records"
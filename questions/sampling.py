@@ -0,0 +1,35 @@
+import hashlib
+import random
+
+from .cache import get_question_ids, get_question_payloads
+
+# Сколько вопросов каждого типа получает абитуриент
+SAMPLE_SIZES = {
+    'Grammar': 10,
+    'Vocabulary': 10,
+    'Reading': 5,
+}
+
+
+def seeded_random(seed_str):
+    """Deterministic RNG seeded from a string such as ``'<iin>-<level>-<stage>'``"""
+    seed = int(hashlib.sha256(seed_str.encode()).hexdigest(), 16) % (10 ** 8)
+    return random.Random(seed)
+
+
+def sample_question_ids(rnd, level, question_type, k=None):
+    """Pick up to ``k`` question IDs from the sorted (level, type) ID array.
+
+    Sampling indices of the ID array draws exactly the same random numbers as
+    sampling a full list of questions ordered by id, so existing applicants keep
+    their forms while only the chosen IDs are ever loaded.
+    """
+    if k is None:
+        k = SAMPLE_SIZES[question_type]
+    ids = get_question_ids(level, question_type)
+    return [ids[i] for i in rnd.sample(range(len(ids)), min(k, len(ids)))]
+
+
+def sample_questions(rnd, level, question_type, k=None):
+    """Same as ``sample_question_ids`` but returns serialized questions"""
+    return get_question_payloads(sample_question_ids(rnd, level, question_type, k))
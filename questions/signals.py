@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_bank_version_on_commit
+from .models import Question, Option
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Option)
+@receiver(post_delete, sender=Option)
+def invalidate_question_pools(sender, **kwargs):
+    """Любое изменение вопроса или варианта ответа сбрасывает кэш пулов"""
+    bump_bank_version_on_commit()
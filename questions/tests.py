@@ -0,0 +1,189 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from tests.models import UserAnswer
+from users.models import Applicant
+
+from .cache import BANK_VERSION_KEY, get_bank_version
+from .models import ImportCheckpoint, Option, Question, QuestionType
+from .utils import (
+    JSONStreamError, import_questions_from_json_stream, iter_json_array, save_question_records,
+    sync_question_records,
+)
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_question(prompt='Choose the right form', level='B1', type=QuestionType.GRAMMAR, correct='A'):
+    question = Question.objects.create(type=type, level=level, prompt=prompt)
+    for label in 'ABCD':
+        Option.objects.create(question=question, label=label, text=f'{prompt} {label}', is_correct=label == correct)
+    return question
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BankVersionTests(TestCase):
+    """Изменения банка сбрасывают кэш пулов ровно одним bump на транзакцию"""
+
+    def setUp(self):
+        cache.delete(BANK_VERSION_KEY)
+        self.version = get_bank_version()
+
+    def test_one_bump_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                create_question()
+                create_question('Pick the synonym', type=QuestionType.VOCABULARY)
+                Question.objects.filter(type=QuestionType.GRAMMAR).delete()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(get_bank_version(), self.version + 1)
+
+    def test_rolled_back_savepoint_does_not_swallow_the_bump(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        create_question()
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                create_question('Pick the synonym', type=QuestionType.VOCABULARY)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(get_bank_version(), self.version + 1)
+
+
+def question_record(prompt='She ___ to school every day.', correct='A', b_text='go'):
+    return {
+        'type': QuestionType.GRAMMAR,
+        'level': 'B1',
+        'prompt': prompt,
+        'paragraph': None,
+        'options': [
+            {'label': 'A', 'text': 'goes', 'is_correct': correct == 'A'},
+            {'label': 'B', 'text': b_text, 'is_correct': correct == 'B'},
+        ],
+    }
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SyncTests(TestCase):
+
+    def test_changed_question_keeps_answer_history(self):
+        sync_question_records([question_record()])
+        question = Question.objects.get()
+        option_b = question.options.get(label='B')
+        applicant = Applicant.objects.create(iin='990101300011', first_name='Sync', last_name='Check')
+        answer = UserAnswer.objects.create(
+            applicant=applicant, question=question, selected_option=option_b, is_correct=False,
+        )
+
+        # The vendor fixed the key and reworded option B
+        stats = sync_question_records([question_record(correct='B', b_text='is going')])
+        self.assertEqual(stats, {'inserted': 0, 'updated': 1, 'unchanged': 0, 'retired': 0})
+
+        answer.refresh_from_db()
+        self.assertEqual(answer.selected_option_id, option_b.id)
+        self.assertFalse(answer.is_correct)
+        option_b.refresh_from_db()
+        self.assertEqual((option_b.text, option_b.is_correct), ('go', False))
+        question.refresh_from_db()
+        self.assertFalse(question.is_active)
+
+        replacement = Question.objects.get(is_active=True)
+        self.assertEqual(
+            list(replacement.options.order_by('label').values_list('text', 'is_correct')),
+            [('goes', False), ('is going', True)],
+        )
+
+        # Going back to the old version reactivates the original row
+        stats = sync_question_records([question_record()])
+        self.assertEqual(stats, {'inserted': 0, 'updated': 1, 'unchanged': 0, 'retired': 0})
+        self.assertEqual(list(Question.objects.filter(is_active=True)), [question])
+        self.assertEqual(UserAnswer.objects.get().selected_option_id, option_b.id)
+
+
+class CountingReader(io.StringIO):
+    """StringIO that remembers how many characters were read"""
+
+    characters_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.characters_read += len(chunk)
+        return chunk
+
+
+class StreamTests(TestCase):
+
+    def test_elements_across_read_boundaries(self):
+        text = '[ {"a": [1, 2.5e3]}, "x,]" , 17 ]\n'
+        for read_size in (1, 3, 64):
+            self.assertEqual(list(iter_json_array(io.StringIO(text), read_size=read_size)),
+                             [{'a': [1, 2500.0]}, 'x,]', 17])
+
+    def test_truncated_input(self):
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_array(io.StringIO('[{"a": 1}, {"b": '), read_size=4))
+
+    def test_malformed_element_stops_at_the_size_limit(self):
+        valid = json.dumps({'prompt': 'x' * 100})
+        reader = CountingReader('[' + valid + ', {"prompt" "missing colon"}, ' + ', '.join([valid] * 10000) + ']')
+        with self.assertRaisesMessage(JSONStreamError, 'Element 2'):
+            list(iter_json_array(reader, read_size=256, max_element_size=4096))
+        # Far less than the ~1 MB file
+        self.assertLess(reader.characters_read, 4096 + 2 * 256 + len(valid))
+
+    def test_trailing_data(self):
+        elements = []
+        with self.assertRaisesMessage(JSONStreamError, 'Extra data'):
+            for element in iter_json_array(io.StringIO('[1, 2] [3]'), read_size=2):
+                elements.append(element)
+        self.assertEqual(elements, [1, 2])
+
+    def test_not_an_array(self):
+        with self.assertRaises(JSONStreamError):
+            list(iter_json_array(io.StringIO('{"type": "Grammar"}')))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StreamImportTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'b1.json')
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump([question_record(prompt=f'Question {number}') for number in range(5)], file)
+
+    def test_resume_after_a_crash(self):
+        calls = []
+
+        def crash_on_second_batch(records, batch_size=500):
+            calls.append(len(records))
+            if len(calls) == 2:
+                raise RuntimeError('worker killed')
+            return save_question_records(records, batch_size=batch_size)
+
+        with mock.patch('questions.utils.save_question_records', side_effect=crash_on_second_batch):
+            with self.assertRaises(RuntimeError):
+                import_questions_from_json_stream(self.path, batch_size=2)
+        self.assertEqual(ImportCheckpoint.objects.get().records_committed, 2)
+        self.assertEqual(Question.objects.count(), 2)
+
+        self.assertEqual(import_questions_from_json_stream(self.path, batch_size=2, resume=True), 3)
+        self.assertEqual(
+            sorted(Question.objects.values_list('prompt', flat=True)),
+            [f'Question {number}' for number in range(5)],
+        )
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_changed_file_ignores_the_checkpoint(self):
+        ImportCheckpoint.objects.create(source=os.path.abspath(self.path), fingerprint='0:0', records_committed=4)
+        self.assertEqual(import_questions_from_json_stream(self.path, batch_size=2, resume=True), 5)
@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import questions_list
+from .views import questions_list, questions_export
 
 urlpatterns = [
     path('list/', questions_list, name='questions-list'),
+    path('export/', questions_export, name='questions-export'),
 ]
\ No newline at end of file
@@ -1,11 +1,36 @@
 import re
 import os
+import json
+import hashlib
 import openpyxl
-from .models import Question, Option, QuestionType
+from django.db import transaction
+from django.db.models import Q
+from .cache import bump_bank_version_on_commit
+from .models import Question, Option, QuestionType, ImportCheckpoint
 
 # === Dispatcher ===
 def import_questions_from_excel(file_path):
-    wb = openpyxl.load_workbook(file_path, data_only=True)
+    """
+    Import questions from a KELET Excel workbook
+
+    The workbook is streamed in read-only mode and all parsed questions are
+    inserted with batched bulk_create calls inside one transaction.
+
+    Returns:
+        int: Number of questions imported
+    """
+    records = parse_excel_file(file_path)
+    return save_question_records(records)
+
+
+def parse_excel_file(file_path):
+    """
+    Parse a KELET Excel workbook into plain question records
+
+    Records have the same shape as the JSON import format
+    (type, level, prompt, paragraph, options[label, text, is_correct]).
+    """
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
     level = os.path.splitext(os.path.basename(file_path))[0][-2:]
 
     sheet_parser_map = {
@@ -14,20 +39,118 @@ def import_questions_from_excel(file_path):
         "reading": parse_reading_sheet,
     }
 
-    for sheet_name in wb.sheetnames:
-        matched = next((key for key in sheet_parser_map if key in sheet_name.lower()), None)
+    records = []
+    try:
+        for sheet_name in wb.sheetnames:
+            matched = next((key for key in sheet_parser_map if key in sheet_name.lower()), None)
 
-        if matched:
-            print(f"📄 Parsing sheet: {sheet_name} as {matched}")
-            sheet_parser_map[matched](wb[sheet_name], level)
-        else:
-            print(f"⚠️ Skipping unknown sheet: {sheet_name}")
+            if matched:
+                print(f"📄 Parsing sheet: {sheet_name} as {matched}")
+                sheet_parser_map[matched](SheetWindow(wb[sheet_name]), level, records)
+            else:
+                print(f"⚠️ Skipping unknown sheet: {sheet_name}")
+    finally:
+        wb.close()
+    return records
+
+
+class _EmptyCell:
+    value = None
+    font = None
+
+
+class SheetWindow:
+    """
+    Random-access view over a read-only worksheet that keeps only a small
+    window of rows in memory.
+
+    Rows are pulled from ``iter_rows`` as the parser looks ahead and dropped
+    once they fall ``keep_behind`` rows behind the last requested row, so the
+    parse_*_sheet functions keep their ``sheet.cell(row=, column=)`` access.
+    """
+
+    def __init__(self, worksheet, keep_behind=16):
+        self.max_row = worksheet.max_row
+        if self.max_row is None:
+            worksheet.calculate_dimension(force=True)
+            self.max_row = worksheet.max_row
+        self._rows = worksheet.iter_rows()
+        self._buffer = {}
+        self._next_row = 1
+        self._keep_behind = keep_behind
+
+    def cell(self, row, column):
+        while self._next_row <= row:
+            cells = next(self._rows, ())
+            self._buffer[self._next_row] = cells
+            self._next_row += 1
+        if row not in self._buffer:
+            raise IndexError(f"Row {row} is no longer in the sheet window")
+
+        for old_row in [r for r in self._buffer if r < row - self._keep_behind]:
+            del self._buffer[old_row]
+
+        cells = self._buffer[row]
+        if column > len(cells):
+            return _EmptyCell()
+        return cells[column - 1]
+
+
+def new_question(records, type, level, prompt, paragraph=None):
+    """Append a plain question record and return it"""
+    record = {
+        'type': str(type),
+        'level': level,
+        'prompt': prompt,
+        'paragraph': paragraph,
+        'options': [],
+    }
+    records.append(record)
+    return record
+
+
+def add_option(question, label, text, is_correct):
+    question['options'].append({'label': label, 'text': text, 'is_correct': is_correct})
+
+
+def save_question_records(records, batch_size=500):
+    """
+    Insert plain question records with batched bulk_create in one transaction
+
+    Returns:
+        int: Number of questions inserted
+    """
+    with transaction.atomic():
+        questions = Question.objects.bulk_create(
+            [
+                Question(
+                    type=record['type'],
+                    level=record['level'],
+                    prompt=record['prompt'],
+                    paragraph=record.get('paragraph') or None,
+                    content_hash=question_content_hash(record),
+                )
+                for record in records
+            ],
+            batch_size=batch_size,
+        )
+        Option.objects.bulk_create(
+            [
+                Option(question=question, **option)
+                for question, record in zip(questions, records)
+                for option in record['options']
+            ],
+            batch_size=batch_size,
+        )
+    # bulk_create does not send signals
+    bump_bank_version_on_commit()
+    return len(questions)
 
 
 def is_numbered(cell_value):
     return isinstance(cell_value, str) and re.match(r"^\d+\.", cell_value.strip())
 
-def parse_grammar_sheet(sheet, level):
+def parse_grammar_sheet(sheet, level, records):
     row = 1
     while row < sheet.max_row:
         number_cell = sheet.cell(row=row, column=2).value
@@ -49,7 +172,8 @@ def parse_grammar_sheet(sheet, level):
                 option_list = re.split(r"[–\-•,]", instruction.split(":")[-1])
                 option_list = [opt.strip().lower() for opt in option_list if opt.strip()]
 
-                q = Question.objects.create(
+                q = new_question(
+                    records,
                     type=QuestionType.GRAMMAR,
                     level=level,
                     prompt=question_text
@@ -62,8 +186,8 @@ def parse_grammar_sheet(sheet, level):
                     opt_cell = sheet.cell(row=question_row + 2, column=3)  # No per-option cell for this type
                     # For this type, we can't check bold per option, so fallback to answer logic
                 for idx, opt in enumerate(option_list):
-                    Option.objects.create(
-                        question=q,
+                    add_option(
+                        q,
                         label=chr(65 + idx),
                         text=opt,
                         is_correct=(opt == answer)
@@ -89,7 +213,8 @@ def parse_grammar_sheet(sheet, level):
                     if option_text.lower().startswith("it seems"):  # Example heuristic
                         correct_index = i
                 use_bold = len(bold_indices) > 0
-                q = Question.objects.create(
+                q = new_question(
+                    records,
                     type=QuestionType.GRAMMAR,
                     level=level,
                     prompt=question_text
@@ -99,8 +224,8 @@ def parse_grammar_sheet(sheet, level):
                         is_correct = i in bold_indices
                     else:
                         is_correct = (i == correct_index)
-                    Option.objects.create(
-                        question=q,
+                    add_option(
+                        q,
                         label=label,
                         text=opt_text,
                         is_correct=is_correct
@@ -111,7 +236,7 @@ def parse_grammar_sheet(sheet, level):
         else:
             row += 1
 
-def parse_reading_sheet(sheet, level):
+def parse_reading_sheet(sheet, level, records):
     row = 1
     while row <= sheet.max_row:
         number_cell = sheet.cell(row=row, column=2).value
@@ -150,7 +275,8 @@ def parse_reading_sheet(sheet, level):
                                 row += 1
                                 break
                             row += 1
-                q = Question.objects.create(
+                q = new_question(
+                    records,
                     type=QuestionType.READING,
                     level=level,
                     prompt=f"{instruction}\n\n{question_text}",
@@ -178,8 +304,8 @@ def parse_reading_sheet(sheet, level):
                 use_bold = len(bold_indices) > 0
                 for idx, (label, opt_text) in enumerate(options):
                     is_correct = idx in bold_indices if use_bold else False
-                    Option.objects.create(
-                        question=q,
+                    add_option(
+                        q,
                         label=label.upper(),
                         text=opt_text,
                         is_correct=is_correct
@@ -189,7 +315,7 @@ def parse_reading_sheet(sheet, level):
         else:
             row += 1
 
-def parse_vocabulary_sheet(sheet, level):
+def parse_vocabulary_sheet(sheet, level, records):
     row = 1
     while row < sheet.max_row:
         number_cell = sheet.cell(row=row, column=2).value
@@ -209,14 +335,15 @@ def parse_vocabulary_sheet(sheet, level):
                 question_text = question_text.strip()
                 answer_row = row + 3
                 answer = (sheet.cell(row=answer_row, column=3).value or "").strip().lower()
-                q = Question.objects.create(
+                q = new_question(
+                    records,
                     type=QuestionType.VOCABULARY,
                     level=level,
                     prompt=question_text
                 )
                 for idx, opt in enumerate(option_list):
-                    Option.objects.create(
-                        question=q,
+                    add_option(
+                        q,
                         label=chr(65 + idx),  # A, B, C, ...
                         text=opt,
                         is_correct=(opt == answer)
@@ -259,7 +386,8 @@ def parse_vocabulary_sheet(sheet, level):
                             answer = str(ans_val).strip().lower()
                             break
                         answer_row += 1
-                q = Question.objects.create(
+                q = new_question(
+                    records,
                     type=QuestionType.VOCABULARY,
                     level=level,
                     prompt=question_text
@@ -269,8 +397,8 @@ def parse_vocabulary_sheet(sheet, level):
                         is_correct = is_bold
                     else:
                         is_correct = (answer == label) or (answer == opt_text.lower())
-                    Option.objects.create(
-                        question=q,
+                    add_option(
+                        q,
                         label=label.upper(),
                         text=opt_text,
                         is_correct=is_correct
@@ -282,7 +410,7 @@ def parse_vocabulary_sheet(sheet, level):
             row += 1
 
 
-def import_questions_from_json(json_data, level=None, clear_existing=False):
+def import_questions_from_json(json_data, level=None, clear_existing=False, sync=False):
     """
     Import questions from JSON data
     
@@ -290,18 +418,23 @@ def import_questions_from_json(json_data, level=None, clear_existing=False):
         json_data (list): List of question dictionaries
         level (str): English level (A1, A2, B1, B2, C1)
         clear_existing (bool): Whether to clear existing questions for this level
+        sync (bool): Diff the data against the bank by content hash instead of
+            inserting everything (see sync_question_records)
     
     Returns:
-        int: Number of questions imported
+        int: Number of questions imported (inserted or updated when syncing)
     """
-    from django.db import transaction
-    
     if not isinstance(json_data, list):
         raise ValueError("JSON data must be a list of questions")
     
     if not level:
         raise ValueError("Level must be specified")
     
+    if sync:
+        records = [parse_question_record(question_data, level) for question_data in json_data]
+        stats = sync_question_records([record for record in records if record is not None])
+        return stats['inserted'] + stats['updated']
+    
     with transaction.atomic():
         if clear_existing:
             Question.objects.filter(level=level).delete()
@@ -335,7 +468,8 @@ def import_questions_from_json(json_data, level=None, clear_existing=False):
                     type=type_mapping[question_type],
                     level=level,
                     prompt=prompt,
-                    paragraph=paragraph if paragraph else None
+                    paragraph=paragraph if paragraph else None,
+                    content_hash=question_content_hash(parse_question_record(question_data, level))
                 )
                 
                 # Create options
@@ -363,7 +497,7 @@ def import_questions_from_json(json_data, level=None, clear_existing=False):
         return imported_count
 
 
-def import_questions_from_json_file(file_path, level=None, clear_existing=False):
+def import_questions_from_json_file(file_path, level=None, clear_existing=False, sync=False, stream=False):
     """
     Import questions from a JSON file
     
@@ -371,30 +505,376 @@ def import_questions_from_json_file(file_path, level=None, clear_existing=False)
         file_path (str): Path to the JSON file
         level (str): English level (A1, A2, B1, B2, C1)
         clear_existing (bool): Whether to clear existing questions for this level
+        sync (bool): Diff the file against the bank by content hash
+        stream (bool): Parse the file incrementally and commit it in batches
+            (see import_questions_from_json_stream)
     
     Returns:
         int: Number of questions imported
     """
-    import json
-    import os
+    if stream:
+        return import_questions_from_json_stream(file_path, level, clear_existing)
     
     # Determine level from filename if not provided
     if not level:
-        filename = os.path.basename(file_path)
-        if filename.startswith('a2'):
-            level = 'A2'
-        elif filename.startswith('b1'):
-            level = 'B1'
-        elif filename.startswith('b2'):
-            level = 'B2'
-        elif filename.startswith('c1'):
-            level = 'C1'
-        else:
-            level = 'A1'  # Default
+        level = level_from_filename(file_path)
     
     with open(file_path, 'r', encoding='utf-8') as file:
         json_data = json.load(file)
     
-    return import_questions_from_json(json_data, level, clear_existing)
+    return import_questions_from_json(json_data, level, clear_existing, sync)
+
+
+def level_from_filename(file_path):
+    """Detect the English level from a JSON file name (b1.json, b1_grammar.json -> B1)"""
+    filename = os.path.basename(file_path)
+    for level in ('A2', 'B1', 'B2', 'C1'):
+        if filename.startswith(level.lower()):
+            return level
+    return 'A1'  # Default
+
+
+QUESTION_TYPE_MAPPING = {
+    'GRAMMAR': QuestionType.GRAMMAR,
+    'READING': QuestionType.READING,
+    'VOCABULARY': QuestionType.VOCABULARY,
+}
+
+
+def parse_question_record(question_data, level):
+    """
+    Validate one JSON question and turn it into a plain question record
+
+    Returns:
+        dict or None: The record, or None if the question is invalid
+    """
+    if not isinstance(question_data, dict):
+        return None
+
+    question_type = str(question_data.get('type', '')).upper()
+    prompt = question_data.get('prompt', '')
+    options_data = question_data.get('options', [])
+
+    if not prompt or not options_data or question_type not in QUESTION_TYPE_MAPPING:
+        return None
+
+    record = new_question(
+        [],
+        type=QUESTION_TYPE_MAPPING[question_type],
+        level=level,
+        prompt=prompt,
+        paragraph=question_data.get('paragraph') or None,
+    )
+    for option_data in options_data:
+        text = option_data.get('text', '')
+        if not text:
+            continue
+        add_option(
+            record,
+            label=option_data.get('label', '').upper(),
+            text=text,
+            is_correct=option_data.get('is_correct', False),
+        )
+    return record
+
+
+def parse_json_file(file_path, level=None):
+    """
+    Parse and validate a JSON question file into plain question records
+
+    Returns:
+        tuple: (records, skipped_count)
+    """
+    if not level:
+        level = level_from_filename(file_path)
 
+    with open(file_path, 'r', encoding='utf-8') as file:
+        json_data = json.load(file)
+
+    if not isinstance(json_data, list):
+        raise ValueError("JSON data must be a list of questions")
+
+    records = [parse_question_record(question_data, level) for question_data in json_data]
+    valid = [record for record in records if record is not None]
+    return valid, len(records) - len(valid)
+
+
+def question_content_hash(record):
+    """sha256 of a question record: type, level, prompt, paragraph and options"""
+    options = sorted(
+        (option['label'], option['text'], bool(option['is_correct']))
+        for option in record['options']
+    )
+    payload = json.dumps(
+        [str(record['type']), record['level'], record['prompt'], record.get('paragraph') or '', options],
+        ensure_ascii=False,
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def sync_question_records(records, batch_size=500):
+    """
+    Synchronize the bank with plain question records using content hashes
+
+    The sync is scoped to the (level, type) pairs present in ``records``.
+    Identical questions are skipped, new questions are inserted and questions
+    missing from the records are retired (is_active=False). A changed
+    question (same type and prompt, different paragraph or options) is
+    retired and inserted again as a new row: existing rows and options are
+    never deleted or rewritten, so answers, their ``is_correct`` and stored
+    test forms keep pointing at what the applicant saw. A retired question
+    whose content comes back unchanged is reactivated.
+
+    Returns:
+        dict: Counts of inserted, updated (replaced or reactivated),
+        unchanged and retired questions
+    """
+    stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'retired': 0}
+    scope = {(record['level'], record['type']) for record in records}
+    if not scope:
+        return stats
+
+    # is_active inside every OR term lets SQLite search the partial (level, type) index per pair
+    active_scope = Q()
+    retired_scope = Q()
+    for level, question_type in scope:
+        active_scope |= Q(level=level, type=question_type, is_active=True)
+        retired_scope |= Q(level=level, type=question_type, is_active=False)
+
+    with transaction.atomic():
+        # Active questions of the scope: one indexed lookup
+        existing = list(
+            Question.objects.filter(active_scope)
+            .order_by('id')
+            .values_list('id', 'type', 'level', 'prompt', 'content_hash')
+        )
+        by_hash = {}
+        by_key = {}
+        record_hashes = [question_content_hash(record) for record in records]
+        unique_hashes = set(record_hashes)
+        for question_id, question_type, level, prompt, content_hash in existing:
+            by_hash.setdefault(content_hash, []).append((question_id, True))
+            # Only rows whose content is gone from the records can be replaced by a new version
+            if content_hash not in unique_hashes:
+                by_key.setdefault((level, question_type, prompt), []).append(question_id)
+
+        # Retired questions only matter if their content comes back: look them up by hash
+        returning = sorted(unique_hashes - set(by_hash))
+        for start in range(0, len(returning), batch_size):
+            retired_rows = (
+                Question.objects.filter(retired_scope, content_hash__in=returning[start:start + batch_size])
+                .order_by('id')
+                .values_list('id', 'content_hash')
+            )
+            for question_id, content_hash in retired_rows:
+                by_hash.setdefault(content_hash, []).append((question_id, False))
+
+        matched = set()
+        replaced = set()
+        reactivate = []
+        to_insert = []
+        for record, content_hash in zip(records, record_hashes):
+            candidates = [c for c in by_hash.get(content_hash, []) if c[0] not in matched]
+            reactivated = False
+            if candidates:
+                question_id, is_active = candidates[0]
+                matched.add(question_id)
+                if is_active:
+                    stats['unchanged'] += 1
+                    continue
+                reactivate.append(question_id)
+                reactivated = True
+            else:
+                to_insert.append(record)
+
+            # A changed question replaces the active row with the same type and prompt (retired below)
+            key = (record['level'], str(record['type']), record['prompt'])
+            candidates = [question_id for question_id in by_key.get(key, []) if question_id not in replaced]
+            if candidates:
+                replaced.add(candidates[0])
+            stats['updated' if candidates or reactivated else 'inserted'] += 1
+
+        if reactivate:
+            Question.objects.filter(id__in=reactivate).update(is_active=True)
+
+        if to_insert:
+            save_question_records(to_insert, batch_size=batch_size)
+
+        retired = [question_id for question_id, *_ in existing if question_id not in matched]
+        # Only active rows are retired; already retired ones are left alone
+        if retired:
+            Question.objects.filter(id__in=retired, is_active=True).update(is_active=False)
+        stats['retired'] = len(retired) - len(replaced)
+
+    bump_bank_version_on_commit()
+    return stats
+
+
+class JSONStreamError(ValueError):
+    """The file is not a well-formed top-level JSON array"""
+
+
+# A question with a long reading paragraph is a few KB; anything far larger is a malformed element
+MAX_JSON_ELEMENT_SIZE = 4 * 1024 * 1024
+
+
+def iter_json_array(file, read_size=64 * 1024, max_element_size=MAX_JSON_ELEMENT_SIZE):
+    """
+    Yield the elements of a top-level JSON array one at a time
+
+    Only the current element and one read buffer are held in memory, so the
+    file size does not matter. An element that is still incomplete after
+    ``max_element_size`` characters raises JSONStreamError instead of pulling
+    the rest of the file into memory. Other malformed input raises
+    JSONStreamError (or json.JSONDecodeError inside an element), like
+    json.load would.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    index = 0
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = file.read(read_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    def fill_element():
+        # A malformed element fails to decode until EOF: stop at the size limit instead
+        if len(buffer) - pos >= max_element_size:
+            raise JSONStreamError(
+                f"Element {index + 1} is not valid JSON within {max_element_size} characters"
+            )
+        fill()
+
+    def expect_end():
+        # json.load rejects anything but whitespace after the value
+        nonlocal pos
+        pos += 1
+        skip_whitespace()
+        if pos < len(buffer):
+            raise JSONStreamError(f"Extra data after the JSON array: {buffer[pos:pos + 20]!r}")
+
+    skip_whitespace()
+    if buffer[pos:pos + 1] != '[':
+        raise JSONStreamError("JSON data must be a list of questions")
+    pos += 1
+
+    skip_whitespace()
+    if buffer[pos:pos + 1] == ']':
+        expect_end()
+        return
+
+    while True:
+        # Decode the next element, reading more until it is complete
+        while True:
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill_element()
+                continue
+            # A number such as 2.5e3 may continue in the next chunk: accept the
+            # element only once the following separator has been read
+            after = end
+            while after < len(buffer) and buffer[after].isspace():
+                after += 1
+            if not eof and (after == len(buffer) or buffer[after] not in ',]'):
+                fill_element()
+                continue
+            break
+        pos = end
+        index += 1
+        yield element
+
+        skip_whitespace()
+        separator = buffer[pos:pos + 1]
+        if separator == ']':
+            expect_end()
+            return
+        if separator != ',':
+            raise JSONStreamError(f"Invalid JSON array: expected ',' or ']' but got {separator!r}")
+        pos += 1
+        skip_whitespace()
+
+
+def import_questions_from_json_stream(file_path, level=None, clear_existing=False, batch_size=500, resume=False):
+    """
+    Import a (very large) JSON file incrementally in fixed-size batches
+
+    Elements are parsed one at a time and validated, and every batch is
+    committed together with an ImportCheckpoint. With ``resume=True`` an
+    import interrupted by a crash continues after the last committed batch of
+    the same, unchanged file. The checkpoint is removed once the file is done.
+
+    Args:
+        file_path (str): Path to the JSON file
+        level (str): English level (A1, A2, B1, B2, C1)
+        clear_existing (bool): Clear the level in the first batch (skipped when resuming)
+        batch_size (int): Number of JSON elements per committed batch
+        resume (bool): Continue from the last committed batch
+
+    Returns:
+        int: Number of questions imported by this run
+    """
+    if not level:
+        level = level_from_filename(file_path)
+
+    source = os.path.abspath(file_path)
+    stat = os.stat(source)
+    fingerprint = f'{stat.st_size}:{stat.st_mtime_ns}'
+
+    checkpoint = ImportCheckpoint.objects.filter(source=source).first()
+    if checkpoint and (not resume or checkpoint.fingerprint != fingerprint):
+        checkpoint.delete()
+        checkpoint = None
+    if checkpoint is None:
+        checkpoint = ImportCheckpoint.objects.create(source=source, fingerprint=fingerprint)
+    skip = checkpoint.records_committed
+    clear_pending = clear_existing and skip == 0
+
+    imported_count = 0
+    batch = []
+    position = 0
+
+    def flush():
+        nonlocal clear_pending, imported_count
+        with transaction.atomic():
+            if clear_pending:
+                Question.objects.filter(level=level).delete()
+                clear_pending = False
+            imported_count += save_question_records(
+                [record for record in batch if record is not None], batch_size=batch_size
+            )
+            checkpoint.records_committed = position
+            checkpoint.save(update_fields=['records_committed', 'updated_at'])
+        batch.clear()
+
+    with open(source, 'r', encoding='utf-8') as file:
+        for question_data in iter_json_array(file):
+            position += 1
+            if position <= skip:
+                continue
+            batch.append(parse_question_record(question_data, level))
+            if len(batch) >= batch_size:
+                flush()
+        if batch or clear_pending:
+            flush()
 
+    checkpoint.delete()
+    return imported_count
@@ -0,0 +1,146 @@
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import Trim
+
+from .cache import bump_bank_version_on_commit
+from .models import Question, Option, QuestionType
+
+# Классы дефектов: код -> описание
+DEFECTS = {
+    'no_options': 'Questions with no options',
+    'no_correct_option': 'Questions with no correct option',
+    'multiple_correct_options': 'Questions with several correct options',
+    'duplicate_labels': 'Questions with duplicate option labels',
+    'empty_option_text': 'Options with empty text',
+    'reading_without_paragraph': 'Reading questions without a paragraph',
+}
+
+# Дефекты, которые исправляются удалением вариантов, а не вопросов
+OPTION_DEFECTS = {'empty_option_text'}
+
+
+class ValidationReport:
+    """Result of a bank validation run.
+
+    ``defects`` maps a defect code to a list of
+    ``{'question_id', 'level', 'type', 'prompt'}`` rows (plus ``option_id`` for
+    option-level defects).
+    """
+
+    def __init__(self, defects):
+        self.defects = defects
+
+    def question_ids(self, codes):
+        return sorted({row['question_id'] for code in codes for row in self.defects.get(code, [])})
+
+    def option_ids(self, codes):
+        return sorted({row['option_id'] for code in codes for row in self.defects.get(code, []) if 'option_id' in row})
+
+    def by_level_and_type(self):
+        """{(level, type): {code: count}} for every group that has defects"""
+        groups = {}
+        for code, rows in self.defects.items():
+            for row in rows:
+                counts = groups.setdefault((row['level'], row['type']), {})
+                counts[code] = counts.get(code, 0) + 1
+        return dict(sorted(groups.items()))
+
+    @property
+    def total(self):
+        return sum(len(rows) for rows in self.defects.values())
+
+
+def validate_bank(queryset=None):
+    """Find every class of defect in three aggregate queries"""
+    questions = queryset if queryset is not None else Question.objects.all()
+    defects = {code: [] for code in DEFECTS}
+
+    # 1. Question-level defects from option counts and the paragraph
+    empty_paragraph = Q(paragraph__isnull=True) | Q(trimmed_paragraph='')
+    rows = (
+        questions
+        .annotate(
+            n_options=Count('options'),
+            n_correct=Count('options', filter=Q(options__is_correct=True)),
+            trimmed_paragraph=Trim('paragraph'),
+        )
+        .filter(
+            Q(n_options=0) | Q(n_correct=0) | Q(n_correct__gt=1)
+            | (Q(type=QuestionType.READING) & empty_paragraph)
+        )
+        .values('id', 'level', 'type', 'prompt', 'n_options', 'n_correct', 'trimmed_paragraph')
+    )
+    for row in rows:
+        base = {'question_id': row['id'], 'level': row['level'], 'type': row['type'], 'prompt': row['prompt']}
+        if row['n_options'] == 0:
+            defects['no_options'].append(base)
+        elif row['n_correct'] == 0:
+            defects['no_correct_option'].append(base)
+        if row['n_correct'] > 1:
+            defects['multiple_correct_options'].append(base)
+        if row['type'] == QuestionType.READING and not row['trimmed_paragraph']:
+            defects['reading_without_paragraph'].append(base)
+
+    # 2. Duplicate labels within a question
+    rows = (
+        Option.objects.filter(question__in=questions)
+        .values('question_id', 'label', 'question__level', 'question__type', 'question__prompt')
+        .annotate(n=Count('id'))
+        .filter(n__gt=1)
+    )
+    seen = set()
+    for row in rows:
+        if row['question_id'] in seen:
+            continue
+        seen.add(row['question_id'])
+        defects['duplicate_labels'].append({
+            'question_id': row['question_id'],
+            'level': row['question__level'],
+            'type': row['question__type'],
+            'prompt': row['question__prompt'],
+        })
+
+    # 3. Options with empty or whitespace-only text
+    rows = (
+        Option.objects.filter(question__in=questions)
+        .annotate(trimmed_text=Trim('text'))
+        .filter(trimmed_text='')
+        .values('id', 'question_id', 'question__level', 'question__type', 'question__prompt')
+    )
+    for row in rows:
+        defects['empty_option_text'].append({
+            'option_id': row['id'],
+            'question_id': row['question_id'],
+            'level': row['question__level'],
+            'type': row['question__type'],
+            'prompt': row['question__prompt'],
+        })
+
+    return ValidationReport(defects)
+
+
+def fix_defects(report, codes, retire=False):
+    """Fix the selected defect classes with one bulk statement per target table.
+
+    Questions are deleted (or retired with ``retire=True``); options with
+    empty text are deleted.
+
+    Returns:
+        tuple: (questions_fixed, options_deleted)
+    """
+    question_ids = report.question_ids([code for code in codes if code not in OPTION_DEFECTS])
+    option_ids = report.option_ids([code for code in codes if code in OPTION_DEFECTS])
+
+    questions_fixed = options_deleted = 0
+    with transaction.atomic():
+        if question_ids:
+            if retire:
+                questions_fixed = Question.objects.filter(id__in=question_ids, is_active=True).update(is_active=False)
+            else:
+                deleted = Question.objects.filter(id__in=question_ids).delete()[1]
+                questions_fixed = deleted.get(Question._meta.label, 0)
+        if option_ids:
+            deleted = Option.objects.filter(id__in=option_ids).delete()[1]
+            options_deleted = deleted.get(Option._meta.label, 0)
+    bump_bank_version_on_commit()
+    return questions_fixed, options_deleted
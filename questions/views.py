@@ -1,24 +1,101 @@
+import json
+from django.http import StreamingHttpResponse
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework import serializers
+from drf_spectacular.utils import extend_schema, inline_serializer, OpenApiParameter, PolymorphicProxySerializer
 from .models import Question, Option
 from .serializers import QuestionSerializer
+from .etags import make_etag, etag_matches, not_modified
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_CHUNK_SIZE = 500
+
+def question_type_param(request):
+    return request.GET.get('type') or ''
+
+def filter_questions(request):
+    question_type = question_type_param(request)
+    questions = Question.objects.filter(is_active=True)
+    if question_type:
+        questions = questions.filter(type=question_type)
+    return questions
+
+QuestionPageSerializer = inline_serializer(
+    name='QuestionPage',
+    fields={
+        'results': QuestionSerializer(many=True),
+        'next_cursor': serializers.IntegerField(allow_null=True),
+    },
+)
 
 @extend_schema(
     summary="List questions",
-    description="Returns a list of all questions. Optionally filter by type using the 'type' query parameter.",
+    description="Without 'cursor' and 'limit' returns the list of all questions, as before. With either of them returns a page ordered by id: {'results', 'next_cursor'}; pass the returned 'next_cursor' as 'cursor' to get the next page. Optionally filter by type using the 'type' query parameter. Supports If-None-Match: an unchanged list or page is answered with 304.",
     parameters=[
-        OpenApiParameter(name='type', description='Type of question to filter by', required=False, type=str)
+        OpenApiParameter(name='type', description='Type of question to filter by', required=False, type=str),
+        OpenApiParameter(name='cursor', description='Return questions with id greater than this value', required=False, type=int),
+        OpenApiParameter(name='limit', description=f'Page size (default {DEFAULT_PAGE_SIZE}, max {MAX_PAGE_SIZE})', required=False, type=int),
     ],
-    responses={200: QuestionSerializer(many=True)},
+    responses={200: PolymorphicProxySerializer(
+        component_name='QuestionList',
+        serializers=[QuestionSerializer(many=True), QuestionPageSerializer],
+        resource_type_field_name=None,
+        many=False,
+    )},
 )
 @api_view(['GET'])
 def questions_list(request):
-    question_type = request.GET.get('type')
-    questions = Question.objects.all()
-    if question_type:
-        questions = questions.filter(type=question_type)
+    # Clients that don't paginate keep getting the whole list as a bare array
+    if 'cursor' not in request.GET and 'limit' not in request.GET:
+        etag = make_etag('questions-list', question_type_param(request), 'all')
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        questions = filter_questions(request).order_by('id').prefetch_related('options')
+        return Response(QuestionSerializer(questions, many=True).data, headers={'ETag': etag})
+
+    try:
+        cursor = int(request.GET.get('cursor', 0))
+        limit = min(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': 'cursor and limit must be integers'}, status=400)
+    if limit < 1:
+        return Response({'error': 'limit must be positive'}, status=400)
+
+    etag = make_etag('questions-list', question_type_param(request), cursor, limit)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # Keyset pagination: seek by id instead of OFFSET, one extra row tells if there is more
+    questions = list(
+        filter_questions(request).filter(id__gt=cursor).order_by('id').prefetch_related('options')[:limit + 1]
+    )
+    has_more = len(questions) > limit
+    questions = questions[:limit]
+
     serializer = QuestionSerializer(questions, many=True)
-    return Response(serializer.data)
+    return Response({
+        'results': serializer.data,
+        'next_cursor': questions[-1].id if has_more else None,
+    }, headers={'ETag': etag})
 
+def export_lines(questions):
+    """Yield one JSON line per question, reading the bank chunk by chunk"""
+    questions = questions.order_by('id').prefetch_related('options')
+    for question in questions.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield json.dumps(QuestionSerializer(question).data, ensure_ascii=False) + '\n'
 
+@extend_schema(
+    summary="Export questions",
+    description="Streams all questions as NDJSON (one question per line). Optionally filter by type using the 'type' query parameter.",
+    parameters=[
+        OpenApiParameter(name='type', description='Type of question to filter by', required=False, type=str)
+    ],
+    responses={200: QuestionSerializer(many=True)},
+)
+@api_view(['GET'])
+def questions_export(request):
+    response = StreamingHttpResponse(export_lines(filter_questions(request)), content_type='application/x-ndjson')
+    response['Content-Disposition'] = 'attachment; filename="questions.ndjson"'
+    return response
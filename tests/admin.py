@@ -1,9 +1,11 @@
 from django.contrib import admin
-from .models import TestResult, UserAnswer, TestSession
+from .models import TestResult, UserAnswer, TestSession, TestForm
 
 @admin.register(TestSession)
 class TestSessionAdmin(admin.ModelAdmin):
     list_display = ['applicant', 'started_at', 'finished_at', 'is_complete']
+    list_select_related = ['applicant']
+    raw_id_fields = ['applicant']
     list_filter = ['started_at', 'finished_at']
     search_fields = ['applicant__iin', 'applicant__first_name', 'applicant__last_name']
     readonly_fields = ['started_at', 'grammar_started_at', 'grammar_finished_at', 
@@ -18,6 +20,8 @@ class TestSessionAdmin(admin.ModelAdmin):
 @admin.register(TestResult)
 class TestResultAdmin(admin.ModelAdmin):
     list_display = ('applicant', 'level', 'correct_answers', 'total_questions', 'score_percentage', 'created_at')
+    list_select_related = ('applicant',)
+    raw_id_fields = ('applicant',)
     list_filter = ('level', 'created_at')
     search_fields = ('applicant__iin', 'applicant__first_name', 'applicant__last_name')
     readonly_fields = ('created_at', 'updated_at')
@@ -31,6 +35,10 @@ class TestResultAdmin(admin.ModelAdmin):
 @admin.register(UserAnswer)
 class UserAnswerAdmin(admin.ModelAdmin):
     list_display = ['applicant', 'question_type', 'is_correct', 'answered_at']
+    # question_type reads obj.question: join it instead of one query per row
+    list_select_related = ['applicant', 'question']
+    # Dropdowns would render every question, option and session of the bank
+    raw_id_fields = ['applicant', 'test_session', 'question', 'selected_option']
     list_filter = ['is_correct', 'answered_at', 'question__type']
     search_fields = ['applicant__iin', 'applicant__first_name', 'applicant__last_name', 'question__prompt']
     readonly_fields = ['answered_at']
@@ -38,3 +46,12 @@ class UserAnswerAdmin(admin.ModelAdmin):
     def question_type(self, obj):
         return obj.question.type
     question_type.short_description = 'Question Type'
+
+@admin.register(TestForm)
+class TestFormAdmin(admin.ModelAdmin):
+    list_display = ['applicant', 'level', 'created_at']
+    list_select_related = ['applicant']
+    raw_id_fields = ['applicant']
+    list_filter = ['level']
+    search_fields = ['applicant__iin']
+    readonly_fields = ['question_ids', 'stages', 'created_at']
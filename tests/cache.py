@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import TestSession
+
+# Ключ состояния активной сессии абитуриента в общем кэше Django
+SESSION_STATE_KEY = 'tests:session_state:{iin}'
+# Сессия длится не больше часа; запас покрывает опоздавшие опросы статуса
+SESSION_STATE_TIMEOUT = 2 * 60 * 60
+
+# Поля, из которых TimeControlService считает статус; хранятся кортежем в этом порядке
+STATE_FIELDS = (
+    'id', 'level', 'started_at', 'finished_at',
+    'grammar_started_at', 'grammar_finished_at',
+    'vocabulary_started_at', 'vocabulary_finished_at',
+    'reading_started_at', 'reading_finished_at',
+)
+# Закэшированное "активной сессии нет" (в отличие от промаха кэша, None)
+NO_ACTIVE_SESSION = ()
+
+
+def get_session_state(iin):
+    """Return the cached state of the applicant's active session.
+
+    ``None`` is a cache miss; ``NO_ACTIVE_SESSION`` means the applicant is
+    known to have no active session; anything else is a state tuple.
+    """
+    return cache.get(SESSION_STATE_KEY.format(iin=iin))
+
+
+def set_session_state(iin, test_session):
+    """Write the session's state through to the cache (``None``: no active session)"""
+    state = NO_ACTIVE_SESSION if test_session is None else tuple(getattr(test_session, field) for field in STATE_FIELDS)
+    cache.set(SESSION_STATE_KEY.format(iin=iin), state, timeout=SESSION_STATE_TIMEOUT)
+
+
+def session_from_state(iin, state):
+    """Rebuild an unsaved ``TestSession`` from a state tuple, without a query"""
+    return TestSession(applicant_id=iin, **dict(zip(STATE_FIELDS, state)))
+
+
+def invalidate_session_state(*iins):
+    """Drop the cached state of the given applicants"""
+    cache.delete_many([SESSION_STATE_KEY.format(iin=iin) for iin in iins])
+
+
+def invalidate_session_state_on_commit(*iins):
+    """Drop the state once the current transaction commits.
+
+    Dropping earlier would let a concurrent request cache the old row again
+    before the change is visible.
+    """
+    transaction.on_commit(lambda: invalidate_session_state(*iins))
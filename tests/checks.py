@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Бэкенды, которые не разделяют данные между процессами
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """Состояние сессий и версия банка вопросов должны быть видны всем процессам"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f'The default cache ({backend}) is not shared between processes.',
+            hint=(
+                'Session states and the question-bank version are written through to the cache; with a '
+                'process-local backend other workers, imports and the sweeper never see each other\'s '
+                'changes. Use FileBasedCache, RedisCache or another shared backend.'
+            ),
+            id='tests.E001',
+        )]
+    return []
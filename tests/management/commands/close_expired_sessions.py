@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from tests.services import SessionStateService
+
+
+class Command(BaseCommand):
+    help = 'Close stages and sessions whose time limit has passed (once, or every --interval seconds with --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and sweep every --interval seconds until interrupted'
+        )
+        parser.add_argument('--interval', type=float, default=60, help='Seconds between sweeps with --loop')
+        parser.add_argument('--batch-size', type=int, default=500, help='Sessions closed per transaction')
+        parser.add_argument(
+            '--grace-minutes',
+            type=float,
+            default=SessionStateService.CLOSE_GRACE_MINUTES,
+            help='Close only what expired more than this many minutes ago, so late submits still find the session'
+        )
+
+    def handle(self, *args, **options):
+        if options['interval'] <= 0 or options['batch_size'] <= 0:
+            raise CommandError('--interval and --batch-size must be positive')
+        if options['grace_minutes'] < 0:
+            raise CommandError('--grace-minutes must not be negative')
+        self.grace_minutes = options['grace_minutes']
+
+        if not options['loop']:
+            self.sweep(options['batch_size'])
+            return
+
+        self.stdout.write(f'Sweeping every {options["interval"]:g}s, Ctrl+C to stop')
+        try:
+            while True:
+                started = time.monotonic()
+                self.sweep(options['batch_size'])
+                # Долгоживущий процесс: не держим соединение дольше CONN_MAX_AGE
+                close_old_connections()
+                time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped')
+
+    def sweep(self, batch_size):
+        started = time.perf_counter()
+        counts = SessionStateService.close_expired(batch_size=batch_size, grace_minutes=self.grace_minutes)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        stages = sum(counts[stage_type] for stage_type in SessionStateService.STAGE_FIELDS)
+        sessions = counts['sessions_timed_out'] + counts['sessions_completed']
+        style = self.style.SUCCESS if stages or sessions else self.style.HTTP_INFO
+        self.stdout.write(style(
+            f'Closed {stages} stages ('
+            + ', '.join(f'{stage_type} {counts[stage_type]}' for stage_type in SessionStateService.STAGE_FIELDS)
+            + f') and {sessions} sessions ({counts["sessions_timed_out"]} timed out, '
+            f'{counts["sessions_completed"]} completed) in {elapsed:.1f}ms'
+        ))
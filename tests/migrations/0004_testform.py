@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-17 03:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0003_alter_testresult_level_alter_testsession_level'),
+        ('users', '0008_alter_applicant_current_level'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestForm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('A1', 'Elementary'), ('A2', 'Pre-Intermediate'), ('B1', 'Intermediate'), ('B2', 'Upper-Intermediate'), ('C1', 'Advanced')], max_length=2)),
+                ('question_ids', models.JSONField(default=dict)),
+                ('stages', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('applicant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_forms', to='users.applicant')),
+            ],
+            options={
+                'verbose_name': 'Test Form',
+                'verbose_name_plural': 'Test Forms',
+                'unique_together': {('applicant', 'level')},
+            },
+        ),
+    ]
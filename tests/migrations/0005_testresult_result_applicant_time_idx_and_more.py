@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-17 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0006_question_question_level_type_idx'),
+        ('tests', '0004_testform'),
+        ('users', '0008_alter_applicant_current_level'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['applicant', 'created_at'], name='result_applicant_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testsession',
+            index=models.Index(condition=models.Q(('finished_at__isnull', True)), fields=['applicant', 'level'], name='session_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useranswer',
+            index=models.Index(fields=['applicant', 'answered_at'], name='answer_applicant_time_idx'),
+        ),
+    ]
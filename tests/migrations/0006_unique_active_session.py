@@ -0,0 +1,48 @@
+# Generated by Django 5.2.3 on 2026-10-17 03:53
+
+from django.db import migrations, models
+from django.db.models import Max
+from django.utils import timezone
+
+STAGE_TIMESTAMPS = [
+    'grammar_started_at', 'grammar_finished_at',
+    'vocabulary_started_at', 'vocabulary_finished_at',
+    'reading_started_at', 'reading_finished_at',
+]
+
+
+def close_duplicate_active_sessions(apps, schema_editor):
+    """Keep the newest active session per (applicant, level); close the rest so the constraint can be created"""
+    TestSession = apps.get_model('tests', 'TestSession')
+    active = TestSession.objects.filter(finished_at__isnull=True)
+    keep = (
+        active.values('applicant_id', 'level')
+        .annotate(last_id=Max('id'))
+        .values_list('last_id', flat=True)
+    )
+    now = timezone.now()
+    for session in active.exclude(id__in=list(keep)):
+        # finished_at must not stay NULL: without started_at use the last stage event, or now
+        stage_timestamps = [getattr(session, field) for field in STAGE_TIMESTAMPS if getattr(session, field)]
+        session.finished_at = session.started_at or max(stage_timestamps, default=None) or now
+        session.save(update_fields=['finished_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0005_testresult_result_applicant_time_idx_and_more'),
+        ('users', '0008_alter_applicant_current_level'),
+    ]
+
+    operations = [
+        migrations.RunPython(close_duplicate_active_sessions, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='testsession',
+            name='session_active_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='testsession',
+            constraint=models.UniqueConstraint(condition=models.Q(('finished_at__isnull', True)), fields=('applicant', 'level'), name='unique_active_session'),
+        ),
+    ]
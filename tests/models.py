@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from users.models import Applicant, EnglishLevel
 
 class TestSession(models.Model):
@@ -20,13 +20,40 @@ class TestSession(models.Model):
     reading_finished_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return f"Session for {self.applicant.iin} [{self.level}] ({self.started_at} - {self.finished_at})"
+        # applicant_id is the IIN: no query for the related applicant
+        return f"Session for {self.applicant_id} [{self.level}] ({self.started_at} - {self.finished_at})"
 
     class Meta:
         ordering = ['-started_at']
         verbose_name = "Test Session"
         verbose_name_plural = "Test Sessions"
         unique_together = ['applicant', 'level', 'started_at']
+        constraints = [
+            # One active session per applicant and level; the unique index only holds active sessions
+            models.UniqueConstraint(
+                fields=['applicant', 'level'],
+                condition=models.Q(finished_at__isnull=True),
+                name='unique_active_session',
+            ),
+        ]
+
+class TestForm(models.Model):
+    """Заранее сформированный вариант теста абитуриента для одного уровня"""
+    applicant = models.ForeignKey(Applicant, on_delete=models.CASCADE, related_name='test_forms')
+    level = models.CharField(max_length=2, choices=EnglishLevel.choices)
+    # Упорядоченные ID вопросов по этапам: {"Grammar": [...], ...}
+    question_ids = models.JSONField(default=dict)
+    # Готовый JSON вопросов по этапам, не зависит от последующих изменений банка
+    stages = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Form for {self.applicant_id} [{self.level}]"
+
+    class Meta:
+        verbose_name = "Test Form"
+        verbose_name_plural = "Test Forms"
+        unique_together = ['applicant', 'level']
 
 class UserAnswer(models.Model):
     """Модель для хранения ответов пользователя на конкретные вопросы"""
@@ -38,12 +65,15 @@ class UserAnswer(models.Model):
     answered_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"{self.applicant.iin} - {self.question.type} - {'Correct' if self.is_correct else 'Incorrect'}"
+        return f"{self.applicant_id} - {self.question.type} - {'Correct' if self.is_correct else 'Incorrect'}"
     
     class Meta:
         ordering = ['-answered_at']
         verbose_name = "User Answer"
         verbose_name_plural = "User Answers"
+        indexes = [
+            models.Index(fields=['applicant', 'answered_at'], name='answer_applicant_time_idx'),
+        ]
 
 class TestResult(models.Model):
     applicant = models.ForeignKey(Applicant, on_delete=models.CASCADE, related_name="test_results")
@@ -56,18 +86,23 @@ class TestResult(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.applicant.iin} - {self.level} - {self.correct_answers}/{self.total_questions}"
+        return f"{self.applicant_id} - {self.level} - {self.correct_answers}/{self.total_questions}"
 
     def save(self, *args, **kwargs):
-        # Call the original save() to ensure the object has an ID
-        super().save(*args, **kwargs)
+        # The result and the applicant update are one write unit
+        with transaction.atomic():
+            # Call the original save() to ensure the object has an ID
+            super().save(*args, **kwargs)
+            self.update_applicant()
 
+    def update_applicant(self):
         # Now update the applicant's level and is_completed
         level_order = ['A1', 'A2', 'B1', 'B2', 'C1']
         score = self.correct_answers / self.total_questions if self.total_questions else 0
 
         applicant = self.applicant
         try:
+            current_level, is_completed = applicant.current_level, applicant.is_completed
             current_idx = level_order.index(applicant.current_level)
             passed_idx = level_order.index(self.level)
             
@@ -82,7 +117,17 @@ class TestResult(models.Model):
                 # If failed, mark as completed
                 applicant.is_completed = True
                 
-            applicant.save(update_fields=["current_level", "is_completed"])
+            # Write only when something changed, and only if nobody promoted the applicant meanwhile
+            if (applicant.current_level, applicant.is_completed) != (current_level, is_completed):
+                Applicant.objects.filter(pk=applicant.pk, current_level=current_level).update(
+                    current_level=applicant.current_level,
+                    is_completed=applicant.is_completed,
+                )
+
+            # Prepare the form for the next level in the background
+            if not applicant.is_completed and applicant.current_level != level_order[current_idx]:
+                from .services import TestFormService
+                TestFormService.schedule_build(applicant)
         except ValueError:
             pass  # Level not found, do nothing
 
@@ -91,3 +136,7 @@ class TestResult(models.Model):
         verbose_name = "Test Result"
         verbose_name_plural = "Test Results"
         unique_together = ['applicant', 'level']
+        indexes = [
+            # Latest result per applicant (results-batch subquery)
+            models.Index(fields=['applicant', 'created_at'], name='result_applicant_time_idx'),
+        ]
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from users.models import EnglishLevel
 from .models import TestResult
 
 class TestResultSerializer(serializers.ModelSerializer):
@@ -13,4 +14,18 @@ class AnswerSerializer(serializers.Serializer):
 class SubmitAnswersSerializer(serializers.Serializer):
     iin = serializers.CharField()
     level = serializers.CharField()
-    answers = AnswerSerializer(many=True) 
\ No newline at end of file
+    answers = AnswerSerializer(many=True)
+
+class SessionStatusBatchSerializer(serializers.Serializer):
+    """IINs and/or a cohort filter over active sessions; at least one is required"""
+    MAX_IINS = 5000
+
+    iins = serializers.ListField(child=serializers.CharField(), required=False, allow_empty=False, max_length=MAX_IINS)
+    level = serializers.ChoiceField(choices=EnglishLevel.choices, required=False)
+    started_after = serializers.DateTimeField(required=False)
+    started_before = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError('Provide iins or a cohort filter (level, started_after, started_before)')
+        return attrs 
\ No newline at end of file
@@ -1,6 +1,30 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Case, DateTimeField, F, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
 from django.utils import timezone
 from datetime import timedelta
-from .models import TestSession
+from questions.cache import get_answer_key
+from questions.sampling import SAMPLE_SIZES, seeded_random, sample_questions
+from .cache import (
+    NO_ACTIVE_SESSION, STATE_FIELDS, get_session_state, invalidate_session_state, invalidate_session_state_on_commit,
+    session_from_state, set_session_state,
+)
+from .models import TestSession, TestForm
+
+logger = logging.getLogger(__name__)
+
+LEVEL_ORDER = ['A1', 'A2', 'B1', 'B2', 'C1']
+
+
+def get_next_level(current_level):
+    """Уровень, который абитуриент сдаёт следующим (последний уровень остаётся последним)"""
+    try:
+        current_idx = LEVEL_ORDER.index(current_level)
+    except ValueError:
+        return current_level
+    return LEVEL_ORDER[min(current_idx + 1, len(LEVEL_ORDER) - 1)]
 
 class TimeControlService:
     # Лимиты времени в минутах
@@ -154,4 +178,425 @@ class TimeControlService:
                 'time_exceeded': cls.is_stage_time_exceeded(test_session, stage_type)
             }
             
-        return status 
\ No newline at end of file
+        return status
+
+    # Колонки пакетного статуса; этап: 0 — не начат, 1 — идёт, 2 — завершён
+    BATCH_STATUS_COLUMNS = ['iin', 'level', 'session_duration', 'session_remaining_time'] + [
+        f'{stage_type.lower()}_{column}'
+        for stage_type in STAGE_TIME_LIMITS
+        for column in ('state', 'duration', 'remaining_time', 'time_exceeded')
+    ]
+    # Поля TestSession, из которых считается пакетный статус, в порядке values_list
+    BATCH_STATUS_FIELDS = ['applicant_id', 'level', 'started_at'] + [
+        f'{stage_type.lower()}_{event}_at' for stage_type in STAGE_TIME_LIMITS for event in ('started', 'finished')
+    ]
+
+    @classmethod
+    def get_session_status_batch(cls, sessions, now=None):
+        """Статус многих активных сессий за один проход.
+
+        sessions — строки values_list(*BATCH_STATUS_FIELDS). Обычный цикл по
+        колонкам, без экземпляров моделей. Значения считаются так же, как в
+        get_session_status (минуты без округления), но с одним now на весь пакет.
+        Возвращает строки в порядке BATCH_STATUS_COLUMNS.
+        """
+        now = now or timezone.now()
+        if not sessions:
+            return []
+        iins, levels, *timestamps = zip(*sessions)
+
+        session_duration = [(now - start).total_seconds() / 60 if start else None for start in timestamps[0]]
+        columns = [
+            iins,
+            levels,
+            session_duration,
+            [cls.SESSION_TIME_LIMIT if d is None else max(0, cls.SESSION_TIME_LIMIT - d) for d in session_duration],
+        ]
+        for index, limit in enumerate(cls.STAGE_TIME_LIMITS.values()):
+            starts, ends = timestamps[1 + 2 * index], timestamps[2 + 2 * index]
+            durations = [
+                ((end or now) - start).total_seconds() / 60 if start else None
+                for start, end in zip(starts, ends)
+            ]
+            columns += [
+                [0 if not start else 2 if end else 1 for start, end in zip(starts, ends)],
+                durations,
+                [limit if d is None else max(0, limit - d) for d in durations],
+                [d is not None and d > limit for d in durations],
+            ]
+        return [list(row) for row in zip(*columns)]
+
+
+class SessionStateService:
+    """Переходы состояния сессии: каждый переход — один условный UPDATE (compare-and-set).
+
+    Повторные клики и ретраи не создают дублей и не затирают чужие изменения:
+    UPDATE срабатывает только из ожидаемого состояния, проигравший запрос
+    просто получает 0 изменённых строк.
+
+    Состояние активной сессии пишется в кэш после каждого перехода
+    (write-through), поэтому опрос статуса обходится без запросов к базе.
+    """
+
+    STAGE_FIELDS = {
+        'Grammar': ('grammar_started_at', 'grammar_finished_at'),
+        'Vocabulary': ('vocabulary_started_at', 'vocabulary_finished_at'),
+        'Reading': ('reading_started_at', 'reading_finished_at'),
+    }
+
+    # Sweeper закрывает сессию только через столько минут после её срока:
+    # автоматическая или опоздавшая отправка ответов в момент истечения
+    # времени должна застать сессию активной
+    CLOSE_GRACE_MINUTES = 5
+
+    @classmethod
+    def get_cached_session(cls, iin, level=None):
+        """Активная сессия из кэша, без запросов.
+
+        Возвращает (cached, session): cached=False — промах, нужно идти в базу;
+        session=None при cached=True — активной сессии точно нет.
+        Если задан level, а в кэше сессия другого уровня, это промах.
+        Просроченная по времени сессия — тоже промах: её мог уже закрыть
+        sweeper, и решать по ней нужно по базе.
+        """
+        state = get_session_state(iin)
+        if state is None:
+            return False, None
+        if state == NO_ACTIVE_SESSION:
+            return level is None, None
+        session = session_from_state(iin, state)
+        if level is not None and session.level != level:
+            return False, None
+        if cls.is_overdue(session):
+            return False, None
+        return True, session
+
+    @classmethod
+    def is_overdue(cls, test_session, now=None):
+        """Истёк лимит сессии или начатого и не завершённого этапа (такие сессии закрывает close_expired)"""
+        now = now or timezone.now()
+        if test_session.started_at and now - test_session.started_at >= timedelta(minutes=TimeControlService.SESSION_TIME_LIMIT):
+            return True
+        for stage_type, (started_field, finished_field) in cls.STAGE_FIELDS.items():
+            started = getattr(test_session, started_field)
+            if started and not getattr(test_session, finished_field) and (
+                now - started >= timedelta(minutes=TimeControlService.STAGE_TIME_LIMITS[stage_type])
+            ):
+                return True
+        return False
+
+    @classmethod
+    def load_active_session(cls, applicant):
+        """Текущая (последняя начатая) активная сессия из базы; результат кэшируется"""
+        session = (
+            TestSession.objects.filter(applicant=applicant, finished_at__isnull=True)
+            .order_by('-started_at').first()
+        )
+        set_session_state(applicant.pk, session)
+        return session
+
+    @classmethod
+    def reload_session(cls, test_session):
+        """Перечитать сессию из базы и обновить кэш.
+
+        Нужна, когда закэшированное состояние отклоняет переход: решение
+        принимается по базе, а не по возможно отставшему кэшу.
+        Возвращает сессию или None, если она уже закрыта.
+        """
+        session = TestSession.objects.filter(pk=test_session.pk, finished_at__isnull=True).first()
+        cls.write_through(test_session.applicant_id, session)
+        return session
+
+    @classmethod
+    def write_through(cls, iin, test_session):
+        """Записать состояние сессии в кэш; закрытую (или отсутствующую) — сбросить"""
+        if test_session is None or test_session.finished_at:
+            # Текущей может стать сессия другого уровня: её найдёт следующий опрос
+            invalidate_session_state(iin)
+        else:
+            set_session_state(iin, test_session)
+
+    @classmethod
+    def get_or_start_session(cls, applicant, level, cached=True):
+        """Активная сессия уровня; создаётся, если её нет.
+
+        Одновременные запросы не создадут вторую сессию: активная сессия
+        уникальна (unique_active_session), проигравший INSERT читает победителя.
+        cached=False — не доверять кэшу и прочитать сессию из базы.
+        Возвращает (session, created).
+        """
+        if cached:
+            _, session = cls.get_cached_session(applicant.pk, level)
+            if session:
+                return session, False
+
+        created = False
+        session = TestSession.objects.filter(applicant=applicant, level=level, finished_at__isnull=True).first()
+        if session is None:
+            try:
+                with transaction.atomic():
+                    session = TestSession.objects.create(applicant=applicant, level=level, started_at=timezone.now())
+                created = True
+            except IntegrityError:
+                session = TestSession.objects.get(applicant=applicant, level=level, finished_at__isnull=True)
+        set_session_state(applicant.pk, session)
+        return session, created
+
+    @classmethod
+    def start_stage(cls, test_session, stage_type):
+        """Отметить начало этапа, если он ещё не начат.
+
+        UPDATE ... SET <stage>_started_at = now
+        WHERE id = ? AND <stage>_started_at IS NULL AND finished_at IS NULL
+        Возвращает True, если этап начал именно этот запрос.
+        """
+        started_field, _ = cls.STAGE_FIELDS[stage_type]
+        if getattr(test_session, started_field):
+            return False
+
+        now = timezone.now()
+        updated = TestSession.objects.filter(
+            pk=test_session.pk, finished_at__isnull=True, **{f'{started_field}__isnull': True}
+        ).update(**{started_field: now})
+        if updated:
+            setattr(test_session, started_field, now)
+        else:
+            # Этап начал параллельный запрос, или сессию уже закрыли (sweeper,
+            # другой воркер): перечитываем всё состояние, а не только время этапа
+            test_session.refresh_from_db(fields=[field for field in STATE_FIELDS if field != 'id'])
+        cls.write_through(test_session.applicant_id, test_session)
+        return bool(updated)
+
+    @classmethod
+    def finish_stage(cls, test_session, stage_type):
+        """Завершить начатый этап, а вместе с последним этапом — и всю сессию.
+
+        UPDATE ... SET <stage>_finished_at = now,
+                       finished_at = CASE WHEN <other stages finished> THEN now END
+        WHERE id = ? AND <stage>_started_at IS NOT NULL AND <stage>_finished_at IS NULL
+              AND finished_at IS NULL
+        Возвращает (finished, session_complete); finished=False — этап уже
+        завершён (например, двойной клик).
+        """
+        started_field, finished_field = cls.STAGE_FIELDS[stage_type]
+        other_finished = [finished for stage, (_, finished) in cls.STAGE_FIELDS.items() if stage != stage_type]
+        now = timezone.now()
+
+        updated = TestSession.objects.filter(
+            pk=test_session.pk,
+            finished_at__isnull=True,
+            **{f'{started_field}__isnull': False, f'{finished_field}__isnull': True},
+        ).update(**{
+            finished_field: now,
+            'finished_at': Case(
+                When(then=Value(now), **{f'{field}__isnull': False for field in other_finished}),
+                default=None,
+                output_field=DateTimeField(),
+            ),
+        })
+        if not updated:
+            # Закэшированное состояние устарело (этап завершил другой запрос или воркер)
+            invalidate_session_state(test_session.applicant_id)
+            return False, False
+
+        setattr(test_session, finished_field, now)
+        # Этапы проходятся по очереди, поэтому загруженной сессии достаточно;
+        # сам finished_at в базе выставляет CASE независимо от этого
+        session_complete = all(getattr(test_session, field) for field in other_finished)
+        if session_complete:
+            test_session.finished_at = now
+        cls.write_through(test_session.applicant_id, test_session)
+        return True, session_complete
+
+    @classmethod
+    def close_expired(cls, now=None, batch_size=500, grace_minutes=None):
+        """Закрыть этапы и сессии, у которых истёк лимит времени.
+
+        Просроченные сессии находит один запрос по частичному индексу активных
+        сессий (unique_active_session), закрывают их несколько UPDATE на пачку:
+        по одному на этап и один на сессии. Время завершения — начало плюс
+        лимит, а не момент прохода; повторный проход ничего не меняет.
+        Закрывается только то, что просрочено больше чем на grace_minutes
+        (по умолчанию CLOSE_GRACE_MINUTES): до этого submit ещё принимается.
+        Возвращает счётчики {'Grammar', 'Vocabulary', 'Reading',
+        'sessions_timed_out', 'sessions_completed'}.
+        """
+        if grace_minutes is None:
+            grace_minutes = cls.CLOSE_GRACE_MINUTES
+        # Дальше now — граница просрочки с учётом льготного периода
+        now = (now or timezone.now()) - timedelta(minutes=grace_minutes)
+        session_limit = timedelta(minutes=TimeControlService.SESSION_TIME_LIMIT)
+        session_expired = Q(started_at__lte=now - session_limit)
+
+        expired = session_expired
+        for stage_type, (started_field, finished_field) in cls.STAGE_FIELDS.items():
+            stage_limit = timedelta(minutes=TimeControlService.STAGE_TIME_LIMITS[stage_type])
+            expired |= Q(**{f'{started_field}__lte': now - stage_limit, f'{finished_field}__isnull': True})
+        rows = list(
+            TestSession.objects.filter(expired, finished_at__isnull=True)
+            .order_by().values_list('id', 'applicant_id')
+        )
+
+        counts = dict.fromkeys([*cls.STAGE_FIELDS, 'sessions_timed_out', 'sessions_completed'], 0)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            ids = [session_id for session_id, _ in batch]
+            with transaction.atomic():
+                # Условия повторяют выборку: этап, завершённый клиентом после неё, не трогаем
+                open_sessions = TestSession.objects.filter(id__in=ids, finished_at__isnull=True)
+                for stage_type, (started_field, finished_field) in cls.STAGE_FIELDS.items():
+                    stage_limit = timedelta(minutes=TimeControlService.STAGE_TIME_LIMITS[stage_type])
+                    counts[stage_type] += open_sessions.filter(
+                        Q(**{f'{started_field}__lte': now - stage_limit}) | session_expired,
+                        **{f'{started_field}__isnull': False, f'{finished_field}__isnull': True},
+                    ).update(**{
+                        # Этап не может пережить сессию
+                        finished_field: Least(
+                            F(started_field) + stage_limit,
+                            Coalesce('started_at', started_field) + session_limit,
+                        ),
+                    })
+
+                all_stages_finished = Q(**{f'{finished}__isnull': False for _, finished in cls.STAGE_FIELDS.values()})
+                counts['sessions_completed'] += open_sessions.filter(all_stages_finished).exclude(
+                    session_expired
+                ).update(finished_at=Greatest(*(finished for _, finished in cls.STAGE_FIELDS.values())))
+                counts['sessions_timed_out'] += open_sessions.filter(session_expired).update(
+                    finished_at=F('started_at') + session_limit
+                )
+                invalidate_session_state_on_commit(*{applicant_id for _, applicant_id in batch})
+        return counts
+
+
+class TestFormService:
+    """Формирование и хранение вариантов теста (TestForm).
+
+    Основной путь — get_form: форма строится (или достраивается) синхронно
+    при запросе этапа. Фоновая сборка после регистрации и повышения уровня
+    только прогревает её заранее: очередь живёт в памяти процесса и теряется
+    при его перезапуске.
+    """
+
+    STAGES = ['Grammar', 'Vocabulary', 'Reading']
+
+    # Один фоновый поток на воркер: формы строятся вне запроса
+    _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='test-forms')
+
+    @classmethod
+    def short_stages(cls, form):
+        """Этапы формы, в которых меньше вопросов, чем SAMPLE_SIZES (или которых нет)"""
+        return [
+            stage_type for stage_type in cls.STAGES
+            if len(form.question_ids.get(stage_type, [])) < SAMPLE_SIZES[stage_type]
+        ]
+
+    @classmethod
+    def build_form(cls, applicant, level):
+        """Сформировать вариант теста для уровня, достроить неполный или вернуть готовый.
+
+        Сохраняются только полные этапы. Если уровень ещё не импортирован или
+        импортирован частично, короткий этап отдаётся как есть, но не
+        замораживается: при следующем обращении он формируется заново.
+        """
+        form = TestForm.objects.filter(applicant=applicant, level=level).first()
+        if form is None:
+            form = TestForm(applicant=applicant, level=level, question_ids={}, stages={})
+        short = cls.short_stages(form)
+        if not short:
+            return form
+
+        sampled = {}
+        for stage_type in short:
+            rnd = seeded_random(f'{applicant.iin}-{level}-{stage_type}')
+            sampled[stage_type] = sample_questions(rnd, level, stage_type)
+        complete = {
+            stage_type: questions for stage_type, questions in sampled.items()
+            if len(questions) >= SAMPLE_SIZES[stage_type]
+        }
+
+        if complete:
+            stages = {stage_type: complete.get(stage_type, form.stages.get(stage_type)) for stage_type in cls.STAGES}
+            stages = {stage_type: questions for stage_type, questions in stages.items() if questions is not None}
+            question_ids = {stage_type: [q['id'] for q in questions] for stage_type, questions in stages.items()}
+            if form.pk is None:
+                try:
+                    with transaction.atomic():
+                        form = TestForm.objects.create(
+                            applicant=applicant,
+                            level=level,
+                            question_ids=question_ids,
+                            stages=stages,
+                        )
+                except IntegrityError:
+                    # Форму уже успели создать параллельно
+                    form = TestForm.objects.get(applicant=applicant, level=level)
+            else:
+                # Выборка детерминирована: параллельная достройка запишет то же самое
+                TestForm.objects.filter(pk=form.pk).update(question_ids=question_ids, stages=stages)
+                form.question_ids, form.stages = question_ids, stages
+
+        # Короткие этапы (и недостающие в параллельно созданной форме) — только в ответ, без сохранения
+        for stage_type in cls.short_stages(form):
+            questions = sampled[stage_type]
+            form.question_ids = {**form.question_ids, stage_type: [q['id'] for q in questions]}
+            form.stages = {**form.stages, stage_type: questions}
+        return form
+
+    @classmethod
+    def get_form(cls, applicant, level):
+        """Получить форму уровня, при необходимости построив или достроив её синхронно"""
+        return cls.build_form(applicant, level)
+
+    @classmethod
+    def schedule_build(cls, applicant):
+        """Прогреть форму следующего уровня в фоне после коммита транзакции.
+
+        Не гарантируется: задача, не выполненная до перезапуска процесса,
+        теряется, и форму построит get_form при первом запросе этапа.
+        """
+        if applicant.is_completed:
+            return
+        level = get_next_level(applicant.current_level)
+        transaction.on_commit(lambda: cls._executor.submit(cls._build_in_background, applicant.pk, level))
+
+    @classmethod
+    def _build_in_background(cls, applicant_id, level):
+        from users.models import Applicant
+
+        close_old_connections()
+        try:
+            applicant = Applicant.objects.get(pk=applicant_id)
+            cls.build_form(applicant, level)
+        except Exception:
+            # Не критично: форму построит get_form при первом запросе этапа
+            logger.exception('Failed to build test form for %s [%s]', applicant_id, level)
+        finally:
+            connection.close()
+
+
+class GradingService:
+    """Проверка ответов по ключу уровня без запросов к банку вопросов"""
+
+    @classmethod
+    def grade(cls, level, answers):
+        """Проверить список ответов целиком.
+
+        Возвращает (graded, correct_count), где graded — список словарей
+        question_id / selected_option_id / is_correct. Ответы на несуществующие
+        вопросы пропускаются, неверный вариант сохраняется как пустой ответ.
+        """
+        answer_key = get_answer_key(level)
+        graded = []
+        correct_count = 0
+        for ans in answers:
+            is_valid, option_id, is_correct = answer_key.grade(ans.get('question_id'), ans.get('selected_option'))
+            if not is_valid:
+                continue
+            graded.append({
+                'question_id': ans.get('question_id'),
+                'selected_option_id': option_id,
+                'is_correct': is_correct,
+            })
+            if is_correct:
+                correct_count += 1
+        return graded, correct_count
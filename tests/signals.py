@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import Applicant
+from .cache import invalidate_session_state_on_commit
+from .models import TestSession
+
+
+@receiver(post_save, sender=TestSession)
+@receiver(post_delete, sender=TestSession)
+def invalidate_session_state(sender, instance, **kwargs):
+    """Сохранение сессии мимо SessionStateService (админка, скрипты) сбрасывает её кэш"""
+    invalidate_session_state_on_commit(instance.applicant_id)
+
+
+@receiver(post_delete, sender=Applicant)
+def invalidate_applicant_session_state(sender, instance, **kwargs):
+    """Удалённый абитуриент не должен отвечать из кэша"""
+    invalidate_session_state_on_commit(instance.pk)
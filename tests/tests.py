@@ -0,0 +1,208 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from questions.models import Option, Question
+from questions.sampling import SAMPLE_SIZES
+from users.models import Applicant
+
+from .models import TestForm, TestResult, TestSession, UserAnswer
+from .services import SessionStateService, TestFormService, TimeControlService
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+LEVEL = 'B1'
+
+
+def create_questions(test_case, question_type, count, level=LEVEL):
+    """Вопросы с четырьмя вариантами; версия банка сдвигается на коммите, как в проде"""
+    with test_case.captureOnCommitCallbacks(execute=True):
+        for number in range(count):
+            question = Question.objects.create(type=question_type, level=level, prompt=f'{question_type} {number}')
+            Option.objects.bulk_create(
+                Option(question=question, label=label, text=f'{number}{label}', is_correct=label == 'A')
+                for label in 'ABCD'
+            )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestFormTests(TestCase):
+
+    def setUp(self):
+        self.applicant = Applicant.objects.create(iin='990101300011', first_name='Form', last_name='Check',
+                                                  current_level='A2')
+
+    def test_empty_level_is_not_frozen(self):
+        form = TestFormService.get_form(self.applicant, LEVEL)
+        self.assertEqual(form.stages, {'Grammar': [], 'Vocabulary': [], 'Reading': []})
+        self.assertFalse(TestForm.objects.exists())
+
+    def test_short_stage_is_rebuilt_once_the_bank_is_complete(self):
+        create_questions(self, 'Grammar', SAMPLE_SIZES['Grammar'] + 5)
+        create_questions(self, 'Vocabulary', SAMPLE_SIZES['Vocabulary'])
+        create_questions(self, 'Reading', 2)
+
+        form = TestFormService.get_form(self.applicant, LEVEL)
+        self.assertEqual(len(form.stages['Reading']), 2)
+        stored = TestForm.objects.get(applicant=self.applicant, level=LEVEL)
+        self.assertEqual(set(stored.stages), {'Grammar', 'Vocabulary'})
+        grammar_ids = stored.question_ids['Grammar']
+
+        # Импорт уровня дошёл до Reading
+        create_questions(self, 'Reading', SAMPLE_SIZES['Reading'])
+
+        form = TestFormService.get_form(self.applicant, LEVEL)
+        self.assertEqual(len(form.stages['Reading']), SAMPLE_SIZES['Reading'])
+        stored.refresh_from_db()
+        self.assertEqual(stored.question_ids['Reading'], [q['id'] for q in form.stages['Reading']])
+        # Полные этапы не пересобираются
+        self.assertEqual(stored.question_ids['Grammar'], grammar_ids)
+
+        with self.assertNumQueries(1):
+            TestFormService.get_form(self.applicant, LEVEL)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SessionTransitionTests(TestCase):
+    """Двойной клик и два воркера: переход срабатывает ровно один раз"""
+
+    def setUp(self):
+        cache.clear()
+        self.applicant = Applicant.objects.create(iin='990101300011', first_name='Cas', last_name='Check')
+        self.session, _ = SessionStateService.get_or_start_session(self.applicant, LEVEL)
+
+    def two_copies(self):
+        # Both requests loaded the session before either of them wrote
+        return TestSession.objects.get(pk=self.session.pk), TestSession.objects.get(pk=self.session.pk)
+
+    def test_double_start_stage(self):
+        first, second = self.two_copies()
+        self.assertTrue(SessionStateService.start_stage(first, 'Grammar'))
+        self.assertFalse(SessionStateService.start_stage(second, 'Grammar'))
+        # The loser sees the winner's time, not its own
+        self.assertEqual(second.grammar_started_at, first.grammar_started_at)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.grammar_started_at, first.grammar_started_at)
+
+    def test_double_finish_stage(self):
+        SessionStateService.start_stage(self.session, 'Grammar')
+        first, second = self.two_copies()
+        self.assertEqual(SessionStateService.finish_stage(first, 'Grammar'), (True, False))
+        self.assertEqual(SessionStateService.finish_stage(second, 'Grammar'), (False, False))
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.grammar_finished_at, first.grammar_finished_at)
+
+    def test_double_finish_of_the_last_stage_closes_the_session_once(self):
+        for stage_type in ('Grammar', 'Vocabulary', 'Reading'):
+            SessionStateService.start_stage(self.session, stage_type)
+            if stage_type != 'Reading':
+                SessionStateService.finish_stage(self.session, stage_type)
+        first, second = self.two_copies()
+        self.assertEqual(SessionStateService.finish_stage(first, 'Reading'), (True, True))
+        self.assertEqual(SessionStateService.finish_stage(second, 'Reading'), (False, False))
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.finished_at, first.finished_at)
+        self.assertFalse(SessionStateService.start_stage(second, 'Reading'))
+
+    def test_concurrent_session_creation_reads_the_winner(self):
+        self.session.delete()
+        first = QuerySet.first
+        winners = []
+
+        def lose_the_race(queryset):
+            result = first(queryset)
+            if queryset.model is TestSession and not winners:
+                # The other worker's INSERT lands between our lookup and our INSERT
+                winners.append(TestSession.objects.create(applicant=self.applicant, level=LEVEL,
+                                                          started_at=timezone.now()))
+            return result
+
+        with mock.patch.object(QuerySet, 'first', autospec=True, side_effect=lose_the_race):
+            session, created = SessionStateService.get_or_start_session(self.applicant, LEVEL, cached=False)
+        self.assertFalse(created)
+        self.assertEqual(session.pk, winners[0].pk)
+        self.assertEqual(TestSession.objects.filter(applicant=self.applicant).count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SweepThenSubmitTests(TestCase):
+    """Ответы, отправленные в момент истечения времени, не теряются из-за sweeper"""
+
+    def setUp(self):
+        cache.clear()
+        create_questions(self, 'Grammar', 1)
+        self.question = Question.objects.get()
+        self.applicant = Applicant.objects.create(iin='990101300011', first_name='Late', last_name='Submit')
+        self.session, _ = SessionStateService.get_or_start_session(self.applicant, LEVEL)
+
+    def expire(self, minutes_over):
+        started_at = timezone.now() - timedelta(minutes=TimeControlService.SESSION_TIME_LIMIT + minutes_over)
+        TestSession.objects.filter(pk=self.session.pk).update(started_at=started_at)
+
+    def submit(self):
+        correct = self.question.options.get(is_correct=True)
+        return self.client.post(reverse('submit-answers'), {
+            'iin': self.applicant.iin,
+            'level': LEVEL,
+            'answers': [{'question_id': self.question.pk, 'selected_option': correct.pk}],
+        }, content_type='application/json')
+
+    def test_submit_after_sweep_within_grace(self):
+        self.expire(minutes_over=1)
+        counts = SessionStateService.close_expired()
+        self.assertEqual(counts['sessions_timed_out'], 0)
+
+        response = self.submit()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['correct_answers'], 1)
+        self.assertTrue(TestResult.objects.filter(applicant=self.applicant, level=LEVEL).exists())
+        self.assertEqual(UserAnswer.objects.filter(test_session=self.session).count(), 1)
+
+    def test_sweep_closes_after_grace(self):
+        self.expire(minutes_over=SessionStateService.CLOSE_GRACE_MINUTES + 1)
+        counts = SessionStateService.close_expired()
+        self.assertEqual(counts['sessions_timed_out'], 1)
+        self.session.refresh_from_db()
+        self.assertIsNotNone(self.session.finished_at)
+        self.assertEqual(self.submit().status_code, 404)
+
+
+class UniqueActiveSessionMigrationTests(TransactionTestCase):
+    """0006 closes duplicate active sessions so that the unique constraint can be added"""
+
+    before = [('tests', '0005_testresult_result_applicant_time_idx_and_more')]
+    after = [('tests', '0006_unique_active_session')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicates_without_started_at_are_closed(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        HistoricalApplicant = apps.get_model('users', 'Applicant')
+        HistoricalSession = apps.get_model('tests', 'TestSession')
+
+        applicant = HistoricalApplicant.objects.create(iin='990101300011', first_name='Old', last_name='Data')
+        now = timezone.now()
+        never_started = HistoricalSession.objects.create(applicant=applicant, level=LEVEL)
+        stage_only = HistoricalSession.objects.create(
+            applicant=applicant, level=LEVEL,
+            grammar_started_at=now - timedelta(hours=2), grammar_finished_at=now - timedelta(hours=1),
+        )
+        newest = HistoricalSession.objects.create(applicant=applicant, level=LEVEL, started_at=now)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+
+        sessions = {session.pk: session for session in TestSession.objects.all()}
+        self.assertIsNone(sessions[newest.pk].finished_at)
+        self.assertEqual(sessions[stage_only.pk].finished_at, now - timedelta(hours=1))
+        self.assertIsNotNone(sessions[never_started.pk].finished_at)
@@ -1,21 +1,23 @@
-import hashlib, random
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from django.utils import timezone
+from django.db import IntegrityError, transaction
 from django.db.models import OuterRef, Subquery
 
 from .models import TestResult, TestSession, UserAnswer
-from .serializers import TestResultSerializer, SubmitAnswersSerializer
-from .services import TimeControlService
+from .serializers import TestResultSerializer, SubmitAnswersSerializer, SessionStatusBatchSerializer
+from .services import TimeControlService, TestFormService, GradingService, SessionStateService
 from users.models import Applicant
-from questions.models import Question, Option
 from questions.serializers import QuestionSerializer
+from questions.cache import get_question_payloads
+from questions.etags import make_etag, etag_matches, not_modified
+from questions.sampling import seeded_random, sample_question_ids
 
 @extend_schema(
     summary="Get personalized questions",
-    description="Returns a personalized set of questions for a user based on their IIN and level. Requires 'iin' as a query parameter.",
+    description="Returns a personalized set of questions for a user based on their IIN and level. Requires 'iin' as a query parameter. Supports If-None-Match: an unchanged set is answered with 304.",
     parameters=[
         OpenApiParameter(name='iin', description='Individual Identification Number', required=True, type=str),
     ],
@@ -45,28 +47,28 @@ def personalized_questions(request):
     if not iin:
         return Response({'error': 'iin are required'}, status=400)
     
-    # Получаем вопросы по типам и уровню
-    vocab_qs = list(Question.objects.filter(type='Vocabulary', level=level))
-    gram_qs = list(Question.objects.filter(type='Grammar', level=level))
-    read_qs = list(Question.objects.filter(type='Reading', level=level))
+    # Набор вопросов определяется версией банка и seed — отвечаем 304, не выбирая заново
+    seed_str = f'{iin}-{level}'
+    etag = make_etag(seed_str)
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
     # Детеминированный random seed по ИИН и уровню
-    seed_str = f'{iin}-{level}'
-    seed = int(hashlib.sha256(seed_str.encode()).hexdigest(), 16) % (10 ** 8)
-    rnd = random.Random(seed)
+    rnd = seeded_random(seed_str)
 
-    vocab_sample = rnd.sample(vocab_qs, min(10, len(vocab_qs)))
-    gram_sample = rnd.sample(gram_qs, min(10, len(gram_qs)))
-    read_sample = rnd.sample(read_qs, min(5, len(read_qs)))
+    # Выбираем только ID вопросов по типам и уровню
+    vocab_ids = sample_question_ids(rnd, level, 'Vocabulary')
+    gram_ids = sample_question_ids(rnd, level, 'Grammar')
+    read_ids = sample_question_ids(rnd, level, 'Reading')
 
-    questions = gram_sample + read_sample + vocab_sample
+    # Загружаем только выбранные вопросы вместе с вариантами
+    questions = get_question_payloads(gram_ids + read_ids + vocab_ids)
 
-    serializer = QuestionSerializer(questions, many=True)
-    return Response(serializer.data)
+    return Response(questions, headers={'ETag': etag})
 
 @extend_schema(
     summary="Get questions by stage type",
-    description="Returns personalized questions for a specific stage (Grammar, Vocabulary, Reading) based on user's IIN and level. Requires 'iin' and 'stage_type' as query parameters.",
+    description="Returns personalized questions for a specific stage (Grammar, Vocabulary, Reading) based on user's IIN and level. Requires 'iin' and 'stage_type' as query parameters. Not ETagged: 'remaining_time_minutes' changes on every call.",
     parameters=[
         OpenApiParameter(name='iin', description='Individual Identification Number', required=True, type=str),
         OpenApiParameter(name='stage_type', description='Stage type (Grammar, Vocabulary, Reading)', required=True, type=str),
@@ -100,54 +102,33 @@ def get_questions_by_stage(request):
     except ValueError:
         level = applicant.current_level
     
-    # Get or create test session for this level
-    test_session, created = TestSession.objects.get_or_create(
-        applicant=applicant,
-        level=level,
-        finished_at__isnull=True,
-        defaults={'started_at': timezone.now()}
-    )
+    # Get or create the active session for this level (unique per applicant and level)
+    test_session, created = SessionStateService.get_or_start_session(applicant, level)
     
     # Check if stage can be started
     can_start, message = TimeControlService.can_start_stage(test_session, stage_type)
+    if not can_start and not created:
+        # The cached state may lag behind another worker: decide on the database before rejecting
+        test_session, created = SessionStateService.get_or_start_session(applicant, level, cached=False)
+        can_start, message = TimeControlService.can_start_stage(test_session, stage_type)
     if not can_start:
         return Response({'error': message}, status=400)
     
-    # Start the specific stage
-    if stage_type == 'Grammar' and not test_session.grammar_started_at:
-        test_session.grammar_started_at = timezone.now()
-        test_session.save(update_fields=['grammar_started_at'])
-    elif stage_type == 'Vocabulary' and not test_session.vocabulary_started_at:
-        test_session.vocabulary_started_at = timezone.now()
-        test_session.save(update_fields=['vocabulary_started_at'])
-    elif stage_type == 'Reading' and not test_session.reading_started_at:
-        test_session.reading_started_at = timezone.now()
-        test_session.save(update_fields=['reading_started_at'])
-    
-    # Get questions for the specific stage
-    questions = list(Question.objects.filter(type=stage_type, level=level))
-    
-    # Deterministic random seed based on IIN and level
-    seed_str = f'{iin}-{level}-{stage_type}'
-    seed = int(hashlib.sha256(seed_str.encode()).hexdigest(), 16) % (10 ** 8)
-    rnd = random.Random(seed)
-    
-    # Sample questions based on stage type
-    if stage_type == 'Grammar':
-        sample_size = min(10, len(questions))
-    elif stage_type == 'Vocabulary':
-        sample_size = min(10, len(questions))
-    elif stage_type == 'Reading':
-        sample_size = min(5, len(questions))
-    
-    sampled_questions = rnd.sample(questions, sample_size)
+    # Start the specific stage (no-op if it is already started)
+    SessionStateService.start_stage(test_session, stage_type)
+    if test_session.finished_at:
+        # Closed meanwhile by the sweeper or another worker
+        return Response({'error': 'Test session already finished'}, status=400)
+    
+    # Questions come from the applicant's stored form, fixed for the whole level
+    test_form = TestFormService.get_form(applicant, level)
+    sampled_questions = test_form.stages[stage_type]
     
     # Add remaining time to response
     remaining_time = TimeControlService.get_remaining_time(test_session, stage_type)
     
-    serializer = QuestionSerializer(sampled_questions, many=True)
     response_data = {
-        'questions': serializer.data,
+        'questions': sampled_questions,
         'remaining_time_minutes': remaining_time,
         'stage_type': stage_type,
         'level': level
@@ -156,7 +137,11 @@ def get_questions_by_stage(request):
 
 @extend_schema(
     summary="Submit answers and get score",
-    description="Accepts user's answers, checks correctness, and returns the score.",
+    description=(
+        "Accepts user's answers, checks correctness, and returns the score. Requires an active session of the level; "
+        "the expiry sweeper leaves a timed-out session open for a grace period, so a submit sent when time runs out "
+        "is still accepted."
+    ),
     request=SubmitAnswersSerializer,
     responses={200: TestResultSerializer},
 )
@@ -189,55 +174,34 @@ def submit_answers(request):
     if existing_result:
         return Response({'error': 'Test result already exists for this applicant and level'}, status=409)
 
-    correct_count = 0
     total = len(answers)
-    saved_answers = []
-    
-    for ans in answers:
-        qid = ans.get('question_id')
-        selected_option_id = ans.get('selected_option')
-        
-        try:
-            question = Question.objects.get(id=qid)
-            selected_option = Option.objects.get(question_id=qid, id=selected_option_id)
-            is_correct = selected_option.is_correct
-            
-            # Save user answer
-            user_answer = UserAnswer.objects.create(
-                applicant=applicant,
-                test_session=test_session,
-                question=question,
-                selected_option=selected_option,
-                is_correct=is_correct
-            )
-            saved_answers.append(user_answer)
-            
-            if is_correct:
-                correct_count += 1
-                
-        except (Question.DoesNotExist, Option.DoesNotExist):
-            # If question or option doesn't exist, mark as incorrect
-            try:
-                question = Question.objects.get(id=qid)
-                user_answer = UserAnswer.objects.create(
+
+    # Grade the whole answer list in memory against the level's answer key
+    graded_answers, correct_count = GradingService.grade(level, answers)
+
+    # Answers, result and applicant promotion are written as one transaction
+    try:
+        with transaction.atomic():
+            saved_answers = UserAnswer.objects.bulk_create([
+                UserAnswer(
                     applicant=applicant,
                     test_session=test_session,
-                    question=question,
-                    selected_option=None,  # Will need to handle this case
-                    is_correct=False
+                    question_id=graded['question_id'],
+                    selected_option_id=graded['selected_option_id'],
+                    is_correct=graded['is_correct']
                 )
-                saved_answers.append(user_answer)
-            except Question.DoesNotExist:
-                # Skip if question doesn't exist
-                continue
+                for graded in graded_answers
+            ])
 
-    # Create TestResult
-    test_result = TestResult.objects.create(
-        applicant=applicant,
-        level=level,
-        correct_answers=correct_count,
-        total_questions=total
-    )
+            test_result = TestResult.objects.create(
+                applicant=applicant,
+                level=level,
+                correct_answers=correct_count,
+                total_questions=total
+            )
+    except IntegrityError:
+        # A concurrent submission for the same level won the race
+        return Response({'error': 'Test result already exists for this applicant and level'}, status=409)
     
     result_serializer = TestResultSerializer(test_result)
     return Response({
@@ -319,44 +283,39 @@ def finish_stage(request):
     if stage_type not in ['Grammar', 'Vocabulary', 'Reading']:
         return Response({'error': 'stage_type must be Grammar, Vocabulary, or Reading'}, status=400)
     
-    try:
-        applicant = Applicant.objects.get(iin=iin)
-    except Applicant.DoesNotExist:
-        return Response({'error': 'Applicant not found'}, status=404)
-    
-    try:
-        test_session = TestSession.objects.get(applicant=applicant, level=level, finished_at__isnull=True)
-    except TestSession.DoesNotExist:
-        return Response({'error': 'No active test session found'}, status=404)
+    # A cached active session of this level implies the applicant exists
+    cached, test_session = SessionStateService.get_cached_session(iin, level)
+    if not cached:
+        try:
+            applicant = Applicant.objects.get(iin=iin)
+        except Applicant.DoesNotExist:
+            return Response({'error': 'Applicant not found'}, status=404)
+        
+        try:
+            test_session = TestSession.objects.get(applicant=applicant, level=level, finished_at__isnull=True)
+        except TestSession.DoesNotExist:
+            return Response({'error': 'No active test session found'}, status=404)
     
     # Validate stage completion
     can_finish, message = TimeControlService.validate_stage_completion(test_session, stage_type)
+    if not can_finish and cached:
+        # The cached state may lag behind another worker: decide on the database before rejecting
+        test_session = SessionStateService.reload_session(test_session)
+        if test_session is None:
+            return Response({'error': 'No active test session found'}, status=404)
+        can_finish, message = TimeControlService.validate_stage_completion(test_session, stage_type)
     if not can_finish:
         return Response({'error': message}, status=400)
     
-    # Finish the specific stage
-    if stage_type == 'Grammar':
-        test_session.grammar_finished_at = timezone.now()
-        test_session.save(update_fields=['grammar_finished_at'])
-    elif stage_type == 'Vocabulary':
-        test_session.vocabulary_finished_at = timezone.now()
-        test_session.save(update_fields=['vocabulary_finished_at'])
-    elif stage_type == 'Reading':
-        test_session.reading_finished_at = timezone.now()
-        test_session.save(update_fields=['reading_finished_at'])
-    
-    # Check if all stages are complete
-    if TimeControlService.is_session_complete(test_session):
-        test_session.finished_at = timezone.now()
-        test_session.save(update_fields=['finished_at'])
-        return Response({
-            'message': f'{stage_type} stage finished successfully',
-            'session_complete': True
-        })
+    # Finish the stage (and the session with its last stage) in one conditional UPDATE
+    finished, session_complete = SessionStateService.finish_stage(test_session, stage_type)
+    if not finished:
+        # A concurrent request (double click, retry) finished it first
+        return Response({'error': f'{stage_type} stage already finished'}, status=400)
     
     return Response({
         'message': f'{stage_type} stage finished successfully',
-        'session_complete': False
+        'session_complete': session_complete
     })
 
 @extend_schema(
@@ -374,19 +333,70 @@ def get_session_status(request):
     if not iin:
         return Response({'error': 'iin is required'}, status=400)
     
-    try:
-        applicant = Applicant.objects.get(iin=iin)
-    except Applicant.DoesNotExist:
-        return Response({'error': 'Applicant not found'}, status=404)
+    # Polling is served from the write-through session cache without queries
+    cached, test_session = SessionStateService.get_cached_session(iin)
+    if not cached:
+        try:
+            applicant = Applicant.objects.get(iin=iin)
+        except Applicant.DoesNotExist:
+            return Response({'error': 'Applicant not found'}, status=404)
+        # Active sessions are unique per level only; the most recent one is current
+        test_session = SessionStateService.load_active_session(applicant)
     
-    try:
-        test_session = TestSession.objects.get(applicant=applicant, finished_at__isnull=True)
-    except TestSession.DoesNotExist:
+    if test_session is None:
         return Response({'error': 'No active test session found'}, status=404)
     
     status_data = TimeControlService.get_session_status(test_session)
     return Response({'session_status': status_data})
 
+@extend_schema(
+    summary="Get session status in batch",
+    description=(
+        "Returns the status of many active sessions at once, for proctors. Accepts a list of IINs, or an object "
+        "with 'iins' and/or a cohort filter ('level', 'started_after', 'started_before'). The payload is a table: "
+        "'columns' names the fields of every row in 'sessions' (stage state: 0 not started, 1 in progress, "
+        "2 finished; times in minutes, unrounded, computed as in session-status at the returned 'now'). 'missing' "
+        "lists requested IINs without an active session."
+    ),
+    request=SessionStatusBatchSerializer,
+    responses={200: {"columns": "array", "sessions": "array", "missing": "array"}},
+)
+@api_view(['POST'])
+def get_session_status_batch(request):
+    # A bare list of IINs, as accepted by results-batch
+    data = {'iins': request.data} if isinstance(request.data, list) else request.data
+    serializer = SessionStatusBatchSerializer(data=data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=400)
+    filters = serializer.validated_data
+    
+    # One query over the partial index of active sessions, no model instances
+    sessions = TestSession.objects.filter(finished_at__isnull=True)
+    if 'iins' in filters:
+        sessions = sessions.filter(applicant_id__in=filters['iins'])
+    if 'level' in filters:
+        sessions = sessions.filter(level=filters['level'])
+    if 'started_after' in filters:
+        sessions = sessions.filter(started_at__gte=filters['started_after'])
+    if 'started_before' in filters:
+        sessions = sessions.filter(started_at__lte=filters['started_before'])
+    rows = sessions.order_by('applicant_id', '-started_at').values_list(*TimeControlService.BATCH_STATUS_FIELDS)
+    
+    # Active sessions are unique per level only; the most recent one is current
+    current = {}
+    for row in rows:
+        current.setdefault(row[0], row)
+    
+    now = timezone.now()
+    response_data = {
+        'now': now,
+        'columns': TimeControlService.BATCH_STATUS_COLUMNS,
+        'sessions': TimeControlService.get_session_status_batch(list(current.values()), now),
+    }
+    if 'iins' in filters:
+        response_data['missing'] = sorted(set(filters['iins']) - current.keys())
+    return Response(response_data)
+
 @extend_schema(
     summary="Get user answers history",
     description="Returns the history of user's answers for analysis. Requires 'iin' as a query parameter.",
@@ -5,6 +5,7 @@ from rest_framework import status
 
 from .serializers import ApplicantSerializer
 from .models import Applicant
+from tests.services import TestFormService
 
 @extend_schema(
     summary="Register applicant",
@@ -23,7 +24,9 @@ def applicant_register(request):
         'first_name': first_name,
         'last_name': last_name
     })
-    if not created:
+    if created:
+        TestFormService.schedule_build(applicant)
+    else:
         # TODO: a lot of useless code here
         updated = False
         if applicant.first_name != first_name: